@@ -1,25 +1,15 @@
 import random
 import time
 
-from src.algorithm.minimax import MinimaxAlgorithm, Game
+from src.algorithm.minimax import MinimaxAlgorithm, Game, RewardPlayer
 
 
 if __name__ == '__main__':
 
-    class Player:
-        def __init__(self, winning_reward):
-            self.winning_reward = winning_reward
-
-        def __str__(self):
-            return "'({}) Reward Player'".format(self.get_winning_reward())
-
-        def get_winning_reward(self):
-            return self.winning_reward
-
     for num_rows in range(3, 5):
         for num_cols in range(3, 5):
             num_connects_to_win = max(min(num_rows, num_cols) - 1, 3)
-            g = Game(num_rows, num_cols, num_connects_to_win, [Player(1), Player(-1)])
+            g = Game(num_rows, num_cols, num_connects_to_win, [RewardPlayer(1), RewardPlayer(-1)])
             minimax = MinimaxAlgorithm(g)
             print("building best policies according to minimax algorithm")
             start = time.clock()
@@ -38,7 +28,7 @@ if __name__ == '__main__':
                     print("Running game {}".format(game_idx))
                     f.write("\n#########################################\n")
                     f.write("Start playing game {}\n".format(game_idx))
-                    g = Game(num_rows, num_cols, num_connects_to_win, [Player(1), Player(-1)])
+                    g = Game(num_rows, num_cols, num_connects_to_win, [RewardPlayer(1), RewardPlayer(-1)])
                     # set a random start location
                     g.make_move(random.randint(0, num_rows * num_cols - 1))
                     f.write(str(g) + "\n")
@@ -0,0 +1,77 @@
+import numpy as np
+
+from src.algorithm.tablebase import Outcome, Tablebase
+from src.model.engine import NO_SYMBOL, X_SYMBOL, O_SYMBOL
+
+# the outcome and move given to positions that are not in the tablebase, and the move of finished games
+NO_OUTCOME = -1
+NO_MOVE = -1
+
+
+class BatchEvaluator:
+    """Evaluates whole batches of positions against a solved tablebase with NumPy array operations
+
+    Each row of a batch is one game state, in the cell layout of model.engine (empty 0, X 1, O -1). Every row is
+    encoded and looked up at once with a binary search over the tablebase keys, and so are the positions after every
+    move of every row, which gives the best moves without a Python loop per position.
+    """
+
+    def __init__(self, tablebase):
+        self.num_cells = tablebase.num_rows * tablebase.num_cols
+        # views of the tablebase arrays, nothing is copied
+        self.keys = np.frombuffer(tablebase.keys, dtype=np.uint64)
+        self.entries = np.frombuffer(tablebase.entries, dtype=np.uint8)
+        self.powers = (3 ** np.arange(self.num_cells)).astype(np.uint64)
+
+    def _lookup(self, keys):
+        """Returns the tablebase entries of the keys, and whether each of them was found"""
+        if len(self.keys) == 0:
+            return np.zeros(keys.shape, dtype=np.uint8), np.zeros(keys.shape, dtype=bool)
+        indices = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return self.entries[indices], self.keys[indices] == keys
+
+    def probe(self, states):
+        """Returns the outcome (Outcome value, or NO_OUTCOME for illegal positions) and the distance to the result in
+        plies of every state of the batch"""
+        states = self._as_batch(states)
+        entries, found = self._lookup(self._encode(states))
+        outcomes = np.where(found, entries >> Tablebase.DISTANCE_BITS, NO_OUTCOME).astype(np.int8)
+        distances = np.where(found, entries & ((1 << Tablebase.DISTANCE_BITS) - 1), 0).astype(np.int8)
+        return outcomes, distances
+
+    def evaluate(self, states):
+        """Returns the best move (NO_MOVE if the game is over or the position is illegal), the outcome and the
+        distance to the result of every state of the batch, the moves being the ones Tablebase.get_best_move plays"""
+        states = self._as_batch(states)
+        outcomes, distances = self.probe(states)
+        if len(states) == 0:
+            return np.empty(0, dtype=np.intp), outcomes, distances
+
+        num_x = np.count_nonzero(states == X_SYMBOL, axis=1)
+        num_o = np.count_nonzero(states == O_SYMBOL, axis=1)
+        digits = np.where(num_x == num_o, X_SYMBOL % 3, O_SYMBOL % 3).astype(np.uint64)
+        child_keys = self._encode(states)[:, np.newaxis] + digits[:, np.newaxis] * self.powers
+        child_entries, found = self._lookup(child_keys)
+        found &= states == NO_SYMBOL
+
+        # the children are scored from the opponent's point of view: the lower the outcome the better, then the
+        # fewest plies, except for a child the opponent wins where the most plies is best
+        child_outcomes = (child_entries >> Tablebase.DISTANCE_BITS).astype(np.int32)
+        child_distances = (child_entries & ((1 << Tablebase.DISTANCE_BITS) - 1)).astype(np.int32)
+        max_distance = (1 << Tablebase.DISTANCE_BITS) - 1
+        ranks = child_outcomes * (max_distance + 1) + np.where(child_outcomes == Outcome.Win.value,
+                                                               max_distance - child_distances, child_distances)
+        no_rank = len(Outcome) * (max_distance + 1)
+        ranks[~found] = no_rank
+
+        best_moves = ranks.argmin(axis=1)
+        has_move = (ranks[np.arange(len(states)), best_moves] != no_rank) & (outcomes != NO_OUTCOME)
+        best_moves = np.where(has_move, best_moves, NO_MOVE)
+        return best_moves, outcomes, distances
+
+    def _as_batch(self, states):
+        return np.asarray(states, dtype=np.int8).reshape(-1, self.num_cells)
+
+    def _encode(self, states):
+        """The base 3 key of every state, the same as tablebase.encode_position"""
+        return np.mod(states, 3).astype(np.uint64).dot(self.powers)
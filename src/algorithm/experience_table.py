@@ -0,0 +1,152 @@
+import heapq
+import math
+
+from collections import OrderedDict
+from enum import Enum
+
+
+class EvictionPolicy(Enum):
+    LeastVisited = "least-visited"
+    LeastRecentlyUsed = "lru"
+    # values estimated from few visits, or close to neutral, tell the agent the least
+    LowValueConfidence = "low-value-confidence"
+
+
+class ExperienceTable:
+    """The value estimate and visit count of every (state, action) pair an agent has seen
+
+    With a capacity, the table never holds more pairs than that: once it is exceeded, a batch of pairs chosen by the
+    eviction policy is dropped, so the cost of choosing them is shared by many insertions.
+    """
+    EVICTION_FRACTION = 0.05
+
+    def __init__(self, capacity=None, eviction_policy=EvictionPolicy.LeastVisited):
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        self.values = {}
+        self.visits = {}
+        # pairs from least to most recently used, only kept for the LRU policy
+        self._recency = OrderedDict() if eviction_policy == EvictionPolicy.LeastRecentlyUsed else None
+
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
+        # called with the pairs of every batch evicted, for the ones keeping a view of the table up to date
+        self.eviction_listener = None
+
+    def __len__(self):
+        return len(self.visits)
+
+    def __contains__(self, state_action_pair):
+        return state_action_pair in self.values
+
+    def __getstate__(self):
+        # the listener belongs to whoever is watching this table now, it is not saved with it
+        state = dict(self.__dict__)
+        state["eviction_listener"] = None
+        return state
+
+    def iteritems(self):
+        """Yields (state action pair, (value, visits)) of the pairs with a value estimate"""
+        for state_action_pair, value in self.values.iteritems():
+            yield state_action_pair, (value, self.visits[state_action_pair])
+
+    def get_value(self, state_action_pair):
+        """Returns the value estimate of a pair, or None if there is none yet"""
+        value = self.values.get(state_action_pair)
+        if value is None:
+            self.num_misses += 1
+        else:
+            self.num_hits += 1
+            self._touch(state_action_pair)
+        return value
+
+    def get_visits(self, state_action_pair):
+        return self.visits.get(state_action_pair, 0)
+
+    def add_visit(self, state_action_pair):
+        if state_action_pair in self.visits:
+            self.visits[state_action_pair] += 1
+            self._touch(state_action_pair)
+        else:
+            self._insert(state_action_pair, 1)
+
+    def update(self, state_action_pair, estimated_return):
+        """Moves the value estimate towards a new return, as the running mean over the visits of the pair"""
+        if state_action_pair not in self.visits:
+            # the pair was evicted since its visit, count that visit again
+            self._insert(state_action_pair, 1)
+        value = self.values.get(state_action_pair, 0.0)
+        self.values[state_action_pair] = value + 1.0 / self.visits[state_action_pair] * (estimated_return - value)
+
+    def merge(self, state_action_pair, num_returns, return_sum):
+        """Adds many visits and their returns at once, with the same result as visiting and updating one by one"""
+        if state_action_pair in self.visits:
+            self.visits[state_action_pair] += num_returns
+            self._touch(state_action_pair)
+        else:
+            self._insert(state_action_pair, num_returns)
+        value = self.values.get(state_action_pair, 0.0)
+        num_visits = self.visits[state_action_pair]
+        self.values[state_action_pair] = value + (return_sum - num_returns * value) / num_visits
+
+    def copy(self):
+        table = ExperienceTable(self.capacity, self.eviction_policy)
+        table.values = dict(self.values)
+        table.visits = dict(self.visits)
+        if self._recency is not None:
+            table._recency = OrderedDict(self._recency)
+        table.num_hits = self.num_hits
+        table.num_misses = self.num_misses
+        table.num_evictions = self.num_evictions
+        return table
+
+    def get_stats(self):
+        num_lookups = self.num_hits + self.num_misses
+        return {
+            "size": len(self),
+            "capacity": self.capacity,
+            "evictions": self.num_evictions,
+            "hits": self.num_hits,
+            "misses": self.num_misses,
+            "hit_rate": float(self.num_hits) / num_lookups if num_lookups else 0.0,
+        }
+
+    def _touch(self, state_action_pair):
+        if self._recency is not None:
+            del self._recency[state_action_pair]
+            self._recency[state_action_pair] = None
+
+    def _insert(self, state_action_pair, num_visits):
+        self.visits[state_action_pair] = num_visits
+        if self._recency is not None:
+            self._recency[state_action_pair] = None
+        if self.capacity is not None and len(self.visits) > self.capacity:
+            self._evict(state_action_pair)
+
+    def _evict(self, inserted_pair):
+        num_to_evict = len(self.visits) - self.capacity + int(self.capacity * ExperienceTable.EVICTION_FRACTION)
+        if self.eviction_policy == EvictionPolicy.LeastRecentlyUsed:
+            # the pair just inserted is the most recently used one, it is never evicted
+            evicted_pairs = [self._recency.popitem(last=False)[0] for _ in range(num_to_evict)]
+        else:
+            if self.eviction_policy == EvictionPolicy.LeastVisited:
+                score = self.visits.get
+            elif self.eviction_policy == EvictionPolicy.LowValueConfidence:
+                score = self._get_value_confidence
+            else:
+                raise ValueError("Eviction policy '{}' not supported".format(self.eviction_policy))
+            candidates = (pair for pair in self.visits if pair != inserted_pair)
+            evicted_pairs = heapq.nsmallest(num_to_evict, candidates, key=score)
+        for state_action_pair in evicted_pairs:
+            del self.visits[state_action_pair]
+            self.values.pop(state_action_pair, None)
+            if self._recency is not None:
+                self._recency.pop(state_action_pair, None)
+        self.num_evictions += len(evicted_pairs)
+        if self.eviction_listener is not None:
+            self.eviction_listener(evicted_pairs)
+
+    def _get_value_confidence(self, state_action_pair):
+        value = self.values.get(state_action_pair, 0.0)
+        return abs(value) * math.sqrt(self.visits[state_action_pair])
@@ -1,10 +1,16 @@
+import cPickle
 import logging
 import random
+import threading
 
 from abc import ABCMeta, abstractmethod
 from enum import Enum
+from Queue import Queue
 from sys import maxint
 
+from src.algorithm.experience_table import ExperienceTable, EvictionPolicy
+from src.model.engine import NO_SYMBOL, X_SYMBOL, O_SYMBOL
+
 
 class Mode(Enum):
     Learn = 1
@@ -21,10 +27,20 @@ class Agent:
         # experience is what the agent has seen so far, it is a dictionary of (state, action) to reward
         self.experiences = {}
         self.mode = Mode.Adaptive
+        # an optional solved tablebase (see algorithm.tablebase) the agent can consult for the best move
+        self.oracle = None
 
     def set_mode(self, mode):
         self.mode = mode
 
+    def set_oracle(self, oracle):
+        self.oracle = oracle
+
+    def forget_trajectory(self):
+        """Drops what was recorded of the game in progress without learning from it, for moves made outside of a
+        game the agent finishes"""
+        pass
+
     @abstractmethod
     def evaluate_game_state(self, state):
         """define how the game should be evaluated, such as what rewards we are getting, used to build up experience"""
@@ -36,6 +52,98 @@ class Agent:
         pass
 
 
+class PublishedExperiences:
+    """The read only view of an experience table the play path of an adaptive agent chooses its moves from"""
+
+    def __init__(self):
+        # (value, visits) of every pair with a value estimate
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_value(self, state_action_pair):
+        entry = self.entries.get(state_action_pair)
+        return entry[0] if entry is not None else None
+
+    def get_visits(self, state_action_pair):
+        entry = self.entries.get(state_action_pair)
+        return entry[1] if entry is not None else 0
+
+
+class BackgroundLearner:
+    """Learns from finished games on a background thread, for agents in Mode.Adaptive
+
+    The thread owns the experience table while it runs, the play path never touches it. It reads `published`, a view
+    of the table filled before the thread starts, that the thread brings up to date every `publish_interval` games learned, with only the pairs updated or evicted
+    since the last time. Publishing costs as much as the games learned, not as the size of the table, and the view
+    holds one entry per pair of the table, so the capacity of the table bounds it too.
+    """
+
+    def __init__(self, experiences, publish_interval=100):
+        self.experiences = experiences
+        self.publish_interval = publish_interval
+        self.published = PublishedExperiences()
+        self.published.entries.update((pair, (value, experiences.get_visits(pair)))
+                                      for pair, value in experiences.values.iteritems())
+        self.num_games_learned = 0
+        self._changed_pairs = set()
+        self._queue = Queue()
+        self.experiences.eviction_listener = self._changed_pairs.update
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def get_play_experiences(self):
+        return self.published
+
+    def submit(self, trajectory, trajectory_rewards):
+        """Queues a finished game to be learned, returns at once"""
+        self._queue.put((trajectory, trajectory_rewards))
+
+    def flush(self):
+        """Waits until every game submitted so far is learned and published"""
+        self._queue.put(self._publish)
+        self._queue.join()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+        self.experiences.eviction_listener = None
+
+    def _run(self):
+        while True:
+            game = self._queue.get()
+            try:
+                if game is None:
+                    self._publish()
+                    return
+                if callable(game):
+                    game()
+                    continue
+                trajectory, trajectory_rewards = game
+                for state_action_pair, estimated_return in \
+                        zip(trajectory, MonteCarloAgent.get_returns(trajectory, trajectory_rewards)):
+                    # the play path does not count visits in adaptive mode, so they are counted here
+                    self.experiences.add_visit(state_action_pair)
+                    self.experiences.update(state_action_pair, estimated_return)
+                    self._changed_pairs.add(state_action_pair)
+                self.num_games_learned += 1
+                if self.num_games_learned % self.publish_interval == 0:
+                    self._publish()
+            finally:
+                self._queue.task_done()
+
+    def _publish(self):
+        for state_action_pair in self._changed_pairs:
+            value = self.experiences.values.get(state_action_pair)
+            if value is None:
+                self.published.entries.pop(state_action_pair, None)
+            else:
+                self.published.entries[state_action_pair] = (value, self.experiences.visits[state_action_pair])
+        self._changed_pairs.clear()
+
+
 class MonteCarloAgent(Agent):
     LOSE_REWARD = -10
     INDETERMINITE_REWARD = 0
@@ -44,20 +152,70 @@ class MonteCarloAgent(Agent):
 
     GAMMA = 1
 
-    def __init__(self):
+    def __init__(self, capacity=None, eviction_policy=EvictionPolicy.LeastVisited, publish_interval=100):
         super(MonteCarloAgent, self).__init__()
+        # the value estimates and visit counts of the (state, action) pairs, bounded by the capacity if one is given
+        self.experiences = ExperienceTable(capacity, eviction_policy)
+        # learns in the background in adaptive mode, started by the first game that finishes in that mode
+        self.learner = None
+        self.publish_interval = publish_interval
 
         self.trajectory = []
         self.trajectory_rewards = []
-        self.visitation_counts = {}
 
         self.games_played = 0
         self.verbose = False
 
     def set_mode(self, mode):
+        if mode != Mode.Adaptive:
+            self.stop_learner()
         self.mode = mode
         self.verbose = self.mode == Mode.Play
 
+    def stop_learner(self):
+        """Learns the games still queued in adaptive mode and hands the table back to the calling thread"""
+        if self.learner is not None:
+            self.learner.stop()
+            self.learner = None
+
+    def get_play_experiences(self):
+        """The table moves are chosen from, the view published by the background learner in adaptive mode"""
+        if self.learner is not None:
+            return self.learner.get_play_experiences()
+        return self.experiences
+
+    def save_experiences(self, filename):
+        """Saves what the agent has learned, so a later run can start from it instead of learning again"""
+        if self.learner is not None:
+            self.learner.flush()
+        with open(filename, "wb") as f:
+            cPickle.dump((self.games_played, self.experiences), f, cPickle.HIGHEST_PROTOCOL)
+
+    def load_experiences(self, filename):
+        self.stop_learner()
+        with open(filename, "rb") as f:
+            self.games_played, self.experiences = cPickle.load(f)
+
+    def forget_trajectory(self):
+        self.trajectory = []
+        self.trajectory_rewards = []
+
+    def add_to_trajectory(self, state_action_pair):
+        self.trajectory.append(state_action_pair)
+        if self.mode != Mode.Adaptive:
+            self.experiences.add_visit(state_action_pair)
+
+    @staticmethod
+    def get_returns(trajectory, trajectory_rewards):
+        """The discounted return following each (state, action) pair of a trajectory"""
+        returns = []
+        for i in range(len(trajectory)):
+            estimated_return = 0
+            for j in range(i, len(trajectory_rewards)):
+                estimated_return += TDPlayer.GAMMA ** (j - i) * trajectory_rewards[j]
+            returns.append(estimated_return)
+        return returns
+
     def evaluate_game_state(self, game):
         winner = game.get_winner()
         if winner is None:
@@ -79,45 +237,51 @@ class MonteCarloAgent(Agent):
         self.games_played += 1
         # evaluate game board's state at the end of the
         self.evaluate_game_state(game)
-        for i, state_action_pair in enumerate(self.trajectory):
-            estimated_return = 0
-            for j in range(i, len(self.trajectory_rewards)):
-                estimated_return += TDPlayer.GAMMA ** (j - i) * self.trajectory_rewards[j]
-            if state_action_pair not in self.experiences:
-                self.experiences[state_action_pair] = 0.0
-            self.experiences[state_action_pair] += 1.0 / self.visitation_counts[state_action_pair] * \
-                (estimated_return - self.experiences[state_action_pair])
+        if self.mode == Mode.Adaptive:
+            if self.learner is None:
+                self.learner = BackgroundLearner(self.experiences, self.publish_interval)
+            self.learner.submit(self.trajectory, self.trajectory_rewards)
+        else:
+            for state_action_pair, estimated_return in \
+                    zip(self.trajectory, MonteCarloAgent.get_returns(self.trajectory, self.trajectory_rewards)):
+                self.experiences.update(state_action_pair, estimated_return)
 
         self.trajectory = []
         self.trajectory_rewards = []
 
     def get_estimated_best_move(self, state, available_positions):
+        if self.oracle is not None and self.mode == Mode.Play:
+            oracle_position = self.oracle.get_best_move(state)
+            if oracle_position in available_positions:
+                if self.verbose:
+                    print("Oracle action is {}".format(oracle_position))
+                return oracle_position
+
+        experiences = self.get_play_experiences()
         best_value = -maxint
         best_position = None
         not_visited_positions = []
         if self.verbose:
             print("Current state is : {}".format(state))
         for available_position in available_positions:
-            if (state, available_position) in self.experiences:
-                if self.experiences[(state, available_position)] > best_value:
-                    best_value = self.experiences[(state, available_position)]
+            value = experiences.get_value((state, available_position))
+            if value is not None:
+                if value > best_value:
+                    best_value = value
                     best_position = available_position
             else:
                 not_visited_positions.append(available_position)
             if self.verbose:
-                if (state, available_position) not in self.visitation_counts:
-                    q_val = -maxint
-                    num_visits = 0
-                else:
-                    q_val = self.experiences[(state, available_position)]
-                    num_visits = self.visitation_counts[(state, available_position)]
+                q_val = value if value is not None else -maxint
+                num_visits = experiences.get_visits((state, available_position))
                 print("Action {}: q-value {} (visited {} times)".format(available_position, q_val, num_visits))
         if best_position is not None:
             if self.verbose:
                 print("Best action is {}".format(best_position))
             if self.mode == Mode.Learn and random.randint(0, 10) <= 2:
                 return best_position
-            if self.mode == Mode.Play:
+            # adaptive agents play like in play mode, and keep learning from the moves they try
+            if self.mode == Mode.Play or self.mode == Mode.Adaptive:
                 if best_value < MonteCarloAgent.DRAW_REWARD and len(not_visited_positions) > 0:
                     if self.verbose:
                         print("best position resulting in non-winning result, resetting the available actions "
@@ -132,6 +296,138 @@ class MonteCarloAgent(Agent):
         return positions[0]
 
 
+class ValueNetworkAgent(Agent):
+    """Learns the value of the positions after its moves with a small network over line features instead of a table
+    (see algorithm.value_network), so what it learns takes the same memory on any board size
+
+    Every legal move is scored in one batch. After each game, the positions reached by the agent's moves are added
+    to a replay buffer with their discounted final reward as target, and the network takes a minibatch step.
+
+    Unlike the Monte Carlo agent, it also learns on the game thread in Mode.Adaptive: a game adds one minibatch
+    step of a few small matrix products, cheaper than scoring the moves of a single turn, and the network keeps the
+    same size however much it learns, so there is no table to hand over to a background learner.
+    """
+    LOSE_REWARD = -1.0
+    DRAW_REWARD = 0.0
+    WIN_REWARD = 1.0
+
+    GAMMA = 0.9
+    EXPLORATION_RATE = 0.1
+
+    def __init__(self, hidden_size=32, learning_rate=0.01, num_batches_per_game=1, seed=None):
+        super(ValueNetworkAgent, self).__init__()
+        self.hidden_size = hidden_size
+        self.learning_rate = learning_rate
+        self.num_batches_per_game = num_batches_per_game
+        self.seed = seed
+        # created for the board the agent plays on, see set_board
+        self.value_function = None
+        self.board_size = None
+
+        # the positions reached by the agent's moves in the current game, and its symbol
+        self.trajectory = []
+        self.symbol = None
+
+        self.games_played = 0
+        self.verbose = False
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.verbose = self.mode == Mode.Play
+
+    def set_board(self, num_rows, num_cols, num_connects_to_win):
+        board_size = (num_rows, num_cols, num_connects_to_win)
+        if self.value_function is not None and self.board_size == board_size:
+            return
+        # imported here so that numpy is only needed by the agents that use it
+        from src.algorithm.value_network import ValueFunction
+        self.value_function = ValueFunction(num_rows, num_cols, num_connects_to_win, self.hidden_size,
+                                            self.learning_rate, seed=self.seed)
+        self.board_size = board_size
+
+    def save_experiences(self, filename):
+        with open(filename, "wb") as f:
+            cPickle.dump((self.games_played, self.board_size, self.value_function), f, cPickle.HIGHEST_PROTOCOL)
+
+    def load_experiences(self, filename):
+        with open(filename, "rb") as f:
+            self.games_played, self.board_size, self.value_function = cPickle.load(f)
+
+    def evaluate_game_state(self, game):
+        """the only reward is the final one, nothing to evaluate before the game is over"""
+        pass
+
+    def get_estimated_best_move(self, state, available_positions):
+        if self.value_function is None:
+            raise RuntimeError("No board is set to the agent, call set_board first.")
+        if self.oracle is not None and self.mode == Mode.Play:
+            oracle_position = self.oracle.get_best_move(state)
+            if oracle_position in available_positions:
+                return oracle_position
+
+        moves = sorted(available_positions)
+        self.symbol = X_SYMBOL if state.count(X_SYMBOL) == state.count(O_SYMBOL) else O_SYMBOL
+        if self.mode != Mode.Play and random.random() < ValueNetworkAgent.EXPLORATION_RATE:
+            best_move = random.choice(moves)
+        else:
+            values = self.value_function.evaluate_moves(state, moves, self.symbol)
+            best_move = moves[int(values.argmax())]
+            if self.verbose:
+                print("Move values are {}, best move is {}".format(dict(zip(moves, values.round(3))), best_move))
+        if self.mode != Mode.Play:
+            afterstate = list(state)
+            afterstate[best_move] = self.symbol
+            self.trajectory.append(afterstate)
+        return best_move
+
+    def get_final_reward(self, result, symbol):
+        if result == NO_SYMBOL:
+            return ValueNetworkAgent.DRAW_REWARD
+        return ValueNetworkAgent.WIN_REWARD if result == symbol else ValueNetworkAgent.LOSE_REWARD
+
+    def forget_trajectory(self):
+        self.trajectory = []
+
+    def evaluate_game_board_final_state(self, game):
+        if self.trajectory:
+            self.games_played += 1
+            reward = self.get_final_reward(game.game_board.get_winning_state(), self.symbol)
+            self._learn(self.trajectory, [self.symbol] * len(self.trajectory), reward)
+            self.value_function.train(self.num_batches_per_game)
+        self.trajectory = []
+
+    def _learn(self, afterstates, symbols, reward):
+        num_moves = len(afterstates)
+        targets = [reward * ValueNetworkAgent.GAMMA ** (num_moves - 1 - i) for i in range(num_moves)]
+        self.value_function.add_afterstates(afterstates, symbols, targets)
+
+    def train_from_records(self, records, epochs=1):
+        """Learns from the moves of both players of recorded games (see model.record), all on the agent's board"""
+        num_games = 0
+        num_afterstates = 0
+        for record in records:
+            self.set_board(record.num_rows, record.num_cols, record.num_connects_to_win)
+            state = [NO_SYMBOL] * (record.num_rows * record.num_cols)
+            afterstates = ([], [])
+            for move_idx, move in enumerate(record.moves):
+                state[move] = X_SYMBOL if move_idx % 2 == 0 else O_SYMBOL
+                afterstates[move_idx % 2].append(list(state))
+            for symbol, player_afterstates in zip((X_SYMBOL, O_SYMBOL), afterstates):
+                if player_afterstates:
+                    self._learn(player_afterstates, [symbol] * len(player_afterstates),
+                                self.get_final_reward(record.result, symbol))
+                    num_afterstates += len(player_afterstates)
+            num_games += 1
+            # the buffer holds the most recent games, train on them before they are replaced
+            if num_afterstates >= self.value_function.batch_size:
+                self.value_function.train(epochs * num_afterstates // self.value_function.batch_size)
+                num_afterstates = 0
+        if num_afterstates > 0:
+            self.value_function.train(max(1, epochs * num_afterstates // self.value_function.batch_size))
+        self.games_played += num_games
+        return num_games
+
+
 class TDPlayer(Agent):
     LOSE_REWARD = -10
     INDETERMINITE_REWARD = 0
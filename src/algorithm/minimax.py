@@ -1,8 +1,8 @@
-import copy
-
 from collections import deque
 from sys import maxint
 
+from src.model.engine import Engine, NO_SYMBOL
+
 
 class MinimaxAlgorithm:
     def __init__(self, game):
@@ -63,91 +63,55 @@ class MinimaxAlgorithm:
         return self.best_policy[state][0]
 
 
+class RewardPlayer:
+    """Stands in for a player in a search, where all that matters about a player is its winning reward"""
+
+    def __init__(self, winning_reward):
+        self.winning_reward = winning_reward
+
+    def __str__(self):
+        return "'({}) Reward Player'".format(self.winning_reward)
+
+    def get_winning_reward(self):
+        return self.winning_reward
+
+
 class Game:
-    NEUTRAL_MOVE_VALUE = 0
+    NEUTRAL_MOVE_VALUE = NO_SYMBOL
 
-    def __init__(self, num_rows, num_cols, num_connects_to_win, players):
+    def __init__(self, num_rows, num_cols, num_connects_to_win, players, engine=None):
+        """The players take turns in the given order, the first one making the next move. The game is played on the
+        given engine (e.g. a clone of the engine of a live game) or on a new empty board."""
         self.num_rows = num_rows
         self.num_cols = num_cols
         self.num_connects_to_win = num_connects_to_win
         self.players = deque(players)
         self.current_player = self.players.popleft()
 
-        self.game_state = [Game.NEUTRAL_MOVE_VALUE] * (self.num_rows * self.num_cols)
-        self.played_moves = set()
-        self.available_moves = set(range(self.num_rows * self.num_cols))
-        self.winner = None
+        # the player's winning rewards are the symbols marked on the board
+        self.engine = engine if engine is not None else Engine(num_rows, num_cols, num_connects_to_win)
+        # the engine updates these in place
+        self.game_state = self.engine.state
+        self.played_moves = self.engine.played_moves
+        self.available_moves = self.engine.available_moves
 
     def __str__(self):
-        game_state_str = (('----' * self.num_cols + '\n').join(['|{:^3d}|' * self.num_cols + '\n'] * self.num_rows)
-                          .format(*self.game_state))
-        return "game state: \n{}\n".format(game_state_str)
-
-    def is_connected(self, move_type, moves):
-        for move in moves:
-            if self.game_state[move] != move_type:
-                return False
-        return True
-
-    def is_space_to_right(self, move):
-        return move % self.num_cols + self.num_connects_to_win <= self.num_cols
-
-    def is_space_down(self, move):
-        return move + self.num_cols * (self.num_connects_to_win - 1) < self.num_rows * self.num_cols
-
-    def is_space_to_left(self, move):
-        return move % self.num_cols + 1 >= self.num_connects_to_win
+        return str(self.engine)
 
     def is_game_over(self):
-        if self.winner is not None:
-            return True
-
-        for played_move in self.played_moves:
-            move_type = self.game_state[played_move]
-            if self.is_space_to_right(played_move):
-                # if there is space to the right, need to evaluate right direction for connection
-                right_connects = set(range(played_move, played_move + self.num_connects_to_win))
-                if self.is_connected(move_type, right_connects):
-                    self.winner = move_type
-                    return True
-                if self.is_space_down(played_move):
-                    # if there is also space for down position, need to evaluate downright
-                    down_right_connects = set(
-                        (played_move + i * (self.num_cols + 1) for i in range(self.num_connects_to_win)))
-                    if self.is_connected(move_type, down_right_connects):
-                        self.winner = move_type
-                        return True
-            if self.is_space_down(played_move):
-                # if there is space down, need to evaluate down direction for connection
-                down_connects = set((played_move + i * self.num_cols for i in range(self.num_connects_to_win)))
-                if self.is_connected(move_type, down_connects):
-                    self.winner = move_type
-                    return True
-                if self.is_space_to_left(played_move):
-                    # if there is also space to the left, need to evaluate down-left direction for connection
-                    down_left_connects = set(
-                        (played_move + i * (self.num_cols - 1) for i in range(self.num_connects_to_win)))
-                    if self.is_connected(move_type, down_left_connects):
-                        self.winner = move_type
-                        return True
-
-        # make sure to check for played moves first, because the last move may have rendered available moves zero, but
-        # the game state is someone winning.
-        if not self.available_moves:
-            return True
-
-        return False
+        return self.engine.is_game_over()
 
     def get_available_moves(self):
         return self.available_moves
 
     def get_winner(self):
-        if self.winner is None:
+        winner = self.engine.winner
+        if winner == NO_SYMBOL:
             return None
-        if self.current_player.get_winning_reward() == self.winner:
+        if self.current_player.get_winning_reward() == winner:
             return self.current_player
         for player in self.players:
-            if player.get_winning_reward() == self.winner:
+            if player.get_winning_reward() == winner:
                 return player
         return None
 
@@ -155,19 +119,14 @@ class Game:
         return Game.NEUTRAL_MOVE_VALUE
 
     def make_move(self, move):
-        self.game_state[move] = self.current_player.get_winning_reward()
-        self.played_moves.add(move)
-        self.available_moves.remove(move)
+        self.engine.make_move(move, self.current_player.get_winning_reward())
         # change to next player's turn
         self.players.append(self.current_player)
         self.current_player = self.players.popleft()
 
     def unmake_move(self, move):
-        self.game_state[move] = Game.NEUTRAL_MOVE_VALUE
-        self.played_moves.remove(move)
-        self.available_moves.add(move)
+        # unmaking the move also reverts a winning state it may have created
+        self.engine.unmake_move(move)
         # change to previous player's turn
         self.players.appendleft(self.current_player)
         self.current_player = self.players.pop()
-        # when unmaking a move, it potentially reverted the winning state
-        self.winner = None
@@ -0,0 +1,85 @@
+import itertools
+
+import numpy as np
+
+from src.algorithm.learning_agents import MonteCarloAgent, TDPlayer
+from src.model.engine import X_SYMBOL, O_SYMBOL
+
+# the symbol played by each player index of a game record
+PLAYER_SYMBOLS = (X_SYMBOL, O_SYMBOL)
+
+
+def _get_final_rewards(results, symbols):
+    """The reward a player gets at the end of the game, the same as MonteCarloAgent.evaluate_game_state"""
+    return np.where(results == 0, MonteCarloAgent.DRAW_REWARD,
+                    np.where(results == symbols, MonteCarloAgent.WIN_REWARD, MonteCarloAgent.LOSE_REWARD))
+
+
+def _collect_trajectories(records, player_indices, num_cells):
+    """Replays the records into the (state, action) pairs of the learning players, with the number of moves left
+    for the player after each of them and the final result of the game"""
+    states = []
+    actions = []
+    moves_left = []
+    symbols = []
+    results = []
+    for record in records:
+        if record.num_rows * record.num_cols != num_cells:
+            raise ValueError("Cannot train on records of different board sizes in one batch")
+        state = [0] * num_cells
+        trajectory_lengths = [(len(record.moves) + 1 - player_index) // 2 for player_index in (0, 1)]
+        for move_idx, move in enumerate(record.moves):
+            player_index = move_idx % 2
+            if player_index in player_indices:
+                states.append(list(state))
+                actions.append(move)
+                moves_left.append(trajectory_lengths[player_index] - move_idx // 2)
+                symbols.append(PLAYER_SYMBOLS[player_index])
+                results.append(record.result)
+            state[move] = PLAYER_SYMBOLS[player_index]
+    return (np.array(states, dtype=np.int8).reshape(-1, num_cells), np.array(actions, dtype=np.int64),
+            np.array(moves_left, dtype=np.int64), np.array(symbols, dtype=np.int64),
+            np.array(results, dtype=np.int64))
+
+
+def _train_batch(agent, records, player_indices, gamma):
+    num_cells = records[0].num_rows * records[0].num_cols
+    states, actions, moves_left, symbols, results = _collect_trajectories(records, player_indices, num_cells)
+    if len(actions) == 0:
+        return
+    # only the final reward is non zero, so the return of every action is the discounted final reward, exactly as
+    # accumulated in MonteCarloAgent.evaluate_game_board_final_state
+    returns = _get_final_rewards(results, symbols) * gamma ** moves_left.astype(np.float64)
+
+    # aggregate the returns of every distinct (state, action) pair, comparing the rows of cells and action as they
+    # are: a base 3 key of the state would not fit 64 bits on boards larger than 6x6
+    pairs = np.column_stack((states, actions))
+    unique_pairs, first_indices, inverse = np.unique(pairs, axis=0, return_index=True, return_inverse=True)
+    return_sums = np.bincount(inverse, weights=returns, minlength=len(unique_pairs))
+    visit_counts = np.bincount(inverse, minlength=len(unique_pairs))
+
+    for idx, first_idx in enumerate(first_indices):
+        state_action_pair = (tuple(states[first_idx].tolist()), int(actions[first_idx]))
+        # the same incremental mean the live updates keep, applied for all the new returns at once
+        agent.experiences.merge(state_action_pair, int(visit_counts[idx]), float(return_sums[idx]))
+
+
+def train_from_records(agent, records, player_index=None, batch_size=10000, gamma=TDPlayer.GAMMA):
+    """Updates a Monte Carlo agent's tables from recorded games (see model.record), batch_size games at a time
+
+    The agent learns the moves of the given player index (0 for X, 1 for O) or, by default, of both players. The
+    default discount is the one used by live learning, so offline and live updates can be mixed.
+    """
+    # the tables are updated here, not by a background learner
+    agent.stop_learner()
+    player_indices = (0, 1) if player_index is None else (player_index,)
+    records = iter(records)
+    num_games = 0
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        _train_batch(agent, batch, player_indices, gamma)
+        num_games += len(batch)
+        agent.games_played += len(batch)
+    return num_games
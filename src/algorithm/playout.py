@@ -0,0 +1,136 @@
+import numpy as np
+
+from src.model.engine import get_win_lines, NO_SYMBOL, X_SYMBOL, O_SYMBOL
+
+WIN_SCORE = 1.0
+DRAW_SCORE = 0.5
+LOSS_SCORE = 0.0
+
+
+class FlatMonteCarloEvaluator:
+    """Scores every legal move of a position by the average result of random playouts after it
+
+    The playouts run as NumPy array operations, chunk_size playouts at a time whatever the number of moves, so the
+    memory used is the same on every call and the time grows linearly with the number of playouts. A playout is a
+    random order in which the empty cells get filled, the players alternating; its winner is the player whose line
+    gets completed first. Every array of a chunk is allocated once, for the largest board position, and written in
+    place by every later chunk; only the random numbers of a chunk are drawn into a new array.
+    """
+    # a fill time later than any real one, for lines that never get completed
+    NEVER = np.iinfo(np.int16).max
+
+    def __init__(self, num_rows, num_cols, num_connects_to_win, num_playouts=1000, seed=None, chunk_size=1024):
+        self.num_cells = num_rows * num_cols
+        self.num_connects_to_win = num_connects_to_win
+        self.num_playouts = num_playouts
+        self.chunk_size = chunk_size
+        lines, _ = get_win_lines(num_rows, num_cols, num_connects_to_win)
+        # the cells of every line, one after the other
+        self.line_cells = np.array(lines, dtype=np.intp).ravel()
+        self.num_lines = len(self.line_cells) // num_connects_to_win
+        self.random_state = np.random.RandomState(seed)
+
+        num_chunk_cells = chunk_size * self.num_cells
+        # the order the empty cells get filled in: random sort keys, each carrying its empty cell index
+        self._sort_keys = np.empty(num_chunk_cells, dtype=np.int64)
+        self._fill_orders = np.empty(num_chunk_cells, dtype=np.intp)
+        self._filled_cells = np.empty(num_chunk_cells, dtype=np.intp)
+        # when each cell gets filled (-1 if it was filled before the playout), and by whom (1 the player to move,
+        # -1 the opponent)
+        self._fill_times = np.empty((chunk_size, self.num_cells), dtype=np.int16)
+        self._owners = np.empty((chunk_size, self.num_cells), dtype=np.int8)
+        self._line_fill_times = np.empty((chunk_size, len(self.line_cells)), dtype=np.int16)
+        self._line_owners = np.empty((chunk_size, len(self.line_cells)), dtype=np.int8)
+        # per line: when its last cell gets filled, the sum of its owners, and when it is completed by a player
+        self._line_last_fill_times = np.empty((chunk_size, self.num_lines), dtype=np.int16)
+        self._line_sums = np.empty((chunk_size, self.num_lines), dtype=np.int8)
+        self._not_owned = np.empty((chunk_size, self.num_lines), dtype=bool)
+        self._completion_times = np.empty((chunk_size, self.num_lines), dtype=np.int16)
+        self._first_completions = np.empty((2, chunk_size), dtype=np.int16)
+        self._first_moves = np.empty(chunk_size, dtype=np.intp)
+        self._row_offsets = (np.arange(chunk_size, dtype=np.intp) * self.num_cells)[:, np.newaxis]
+
+    def score_moves(self, state):
+        """Returns the legal moves of a position and, for each of them, the average playout score of the player to
+        move (1 for a win, 0.5 for a draw and 0 for a loss)"""
+        state = np.asarray(state, dtype=np.int8)
+        empty_cells = np.flatnonzero(state == NO_SYMBOL)
+        num_moves = len(empty_cells)
+        if num_moves == 0:
+            return empty_cells, np.empty(0)
+        symbol = X_SYMBOL if np.count_nonzero(state == X_SYMBOL) == np.count_nonzero(state == O_SYMBOL) \
+            else O_SYMBOL
+        # the fill time and owner of the n-th empty cell filled, the player to move filling the even ones
+        fill_times = np.arange(num_moves, dtype=np.int16)
+        owners = np.where(fill_times % 2 == 0, 1, -1).astype(np.int8)
+
+        wins = np.zeros(num_moves)
+        losses = np.zeros(num_moves)
+        total_playouts = num_moves * self.num_playouts
+        for start in range(0, total_playouts, self.chunk_size):
+            chunk_size = min(self.chunk_size, total_playouts - start)
+            first_moves = self._first_moves[:chunk_size]
+            first_moves[:] = np.arange(start, start + chunk_size)
+            first_moves //= self.num_playouts
+            won, lost = self._play_chunk(state * symbol, empty_cells, fill_times, owners, first_moves)
+            wins += np.bincount(first_moves, weights=won, minlength=num_moves)
+            losses += np.bincount(first_moves, weights=lost, minlength=num_moves)
+        scores = (wins * WIN_SCORE + losses * LOSS_SCORE + (self.num_playouts - wins - losses) * DRAW_SCORE)
+        return empty_cells, scores / self.num_playouts
+
+    def _play_chunk(self, relative_state, empty_cells, fill_times, owners, first_moves):
+        """Plays one chunk of playouts, the n-th starting with the move first_moves[n]. Returns whether each of them
+        was won and lost by the player to move."""
+        chunk_size = len(first_moves)
+        num_moves = len(empty_cells)
+        rows = np.arange(chunk_size)
+
+        # a random fill order of the empty cells per playout, where the first cell filled is the move being scored:
+        # the keys sort by their random part, and the key of the first move is below all the random ones
+        sort_keys = self._sort_keys[:chunk_size * num_moves].reshape(chunk_size, num_moves)
+        sort_keys[:] = self.random_state.randint(0, 1 << 31, (chunk_size, num_moves))
+        sort_keys *= num_moves
+        sort_keys += np.arange(num_moves)
+        sort_keys[rows, first_moves] = first_moves - num_moves
+        sort_keys.sort(axis=1)
+        fill_orders = self._fill_orders[:chunk_size * num_moves].reshape(chunk_size, num_moves)
+        np.mod(sort_keys, num_moves, out=fill_orders)
+        # the cells filled, in order, as indices into the chunk arrays
+        filled_cells = self._filled_cells[:chunk_size * num_moves].reshape(chunk_size, num_moves)
+        np.take(empty_cells, fill_orders, out=filled_cells, mode="clip")
+        filled_cells += self._row_offsets[:chunk_size]
+
+        chunk_fill_times = self._fill_times[:chunk_size]
+        chunk_fill_times.fill(-1)
+        np.put(chunk_fill_times, filled_cells, fill_times)
+        chunk_owners = self._owners[:chunk_size]
+        chunk_owners[:] = relative_state
+        np.put(chunk_owners, filled_cells, owners)
+
+        line_shape = (chunk_size, self.num_lines, self.num_connects_to_win)
+        line_fill_times = self._line_fill_times[:chunk_size]
+        # out is written directly, without a temporary copy, in the clip mode; all the cells are on the board anyway
+        np.take(chunk_fill_times, self.line_cells, axis=1, out=line_fill_times, mode="clip")
+        line_owners = self._line_owners[:chunk_size]
+        np.take(chunk_owners, self.line_cells, axis=1, out=line_owners, mode="clip")
+        line_sums = self._line_sums[:chunk_size]
+        np.sum(line_owners.reshape(line_shape), axis=2, out=line_sums)
+        line_last_fill_times = self._line_last_fill_times[:chunk_size]
+        np.max(line_fill_times.reshape(line_shape), axis=2, out=line_last_fill_times)
+
+        not_owned = self._not_owned[:chunk_size]
+        completion_times = self._completion_times[:chunk_size]
+        first_completions = self._first_completions[:, :chunk_size]
+        for player_idx, owner in enumerate((1, -1)):
+            # a line is completed by a player when its last cell is filled, if the player owns all its cells
+            np.not_equal(line_sums, owner * self.num_connects_to_win, out=not_owned)
+            np.copyto(completion_times, line_last_fill_times)
+            np.copyto(completion_times, FlatMonteCarloEvaluator.NEVER, where=not_owned)
+            np.min(completion_times, axis=1, out=first_completions[player_idx])
+        return first_completions[0] < first_completions[1], first_completions[1] < first_completions[0]
+
+    def get_best_move(self, state):
+        moves, scores = self.score_moves(state)
+        if len(moves) == 0:
+            return None
+        return int(moves[scores.argmax()])
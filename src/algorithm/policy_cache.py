@@ -0,0 +1,132 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from src.algorithm.minimax import MinimaxAlgorithm, Game, RewardPlayer
+from src.algorithm.tablebase import encode_position
+from src.model.engine import X_SYMBOL, O_SYMBOL
+
+# where the solved policies are shared with the other processes of the host, memory backed when possible
+SHARED_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+FILE_MAGIC = "TTTP"
+# part of the file names, bump it when the file layout or the solver changes so old shared files are not used
+FILE_VERSION = 1
+HEADER_FORMAT = "<4sBQ"
+KEY_FORMAT = "<Q"
+
+logger = logging.getLogger(__name__)
+
+# the policies of this process, by (num_rows, num_cols, num_connects_to_win)
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+class SharedPolicy:
+    """A read only minimax policy (game state to best move) in a memory mapped file
+
+    The file holds the sorted encoded states followed by their moves, so a lookup is a binary search and every
+    process mapping the file shares the same physical pages.
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_states = struct.unpack_from(HEADER_FORMAT, self._map)
+        if magic != FILE_MAGIC:
+            raise ValueError("'{}' is not a policy file".format(filename))
+        if version != FILE_VERSION:
+            raise ValueError("'{}' is a version {} policy file, expected version {}".format(filename, version,
+                                                                                          FILE_VERSION))
+        self._keys_offset = struct.calcsize(HEADER_FORMAT)
+        self._moves_offset = self._keys_offset + self.num_states * struct.calcsize(KEY_FORMAT)
+
+    def __len__(self):
+        return self.num_states
+
+    def __contains__(self, state):
+        return self._find(encode_position(state)) is not None
+
+    def __getitem__(self, state):
+        idx = self._find(encode_position(state))
+        if idx is None:
+            raise KeyError(state)
+        return ord(self._map[self._moves_offset + idx])
+
+    def get(self, state, default=None):
+        idx = self._find(encode_position(state))
+        return default if idx is None else ord(self._map[self._moves_offset + idx])
+
+    def _find(self, key):
+        low, high = 0, self.num_states
+        key_size = struct.calcsize(KEY_FORMAT)
+        while low < high:
+            mid = (low + high) // 2
+            mid_key = struct.unpack_from(KEY_FORMAT, self._map, self._keys_offset + mid * key_size)[0]
+            if mid_key < key:
+                low = mid + 1
+            elif mid_key > key:
+                high = mid
+            else:
+                return mid
+        return None
+
+    @staticmethod
+    def write(policy, filename):
+        """Writes a policy dict to a file, replacing the file at once so readers never see a partial one"""
+        entries = sorted((encode_position(state), move) for state, move in policy.iteritems())
+        temp_filename = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temp_filename, "wb") as f:
+            f.write(struct.pack(HEADER_FORMAT, FILE_MAGIC, FILE_VERSION, len(entries)))
+            f.write("".join(struct.pack(KEY_FORMAT, key) for key, _ in entries))
+            f.write("".join(chr(move) for _, move in entries))
+        os.rename(temp_filename, filename)
+
+
+def build_policy(num_rows, num_cols, num_connects_to_win):
+    """Solves the board from the empty position with X moving first, as in live games. Returns the best move of
+    every state the search visits, for both players."""
+    players = [RewardPlayer(X_SYMBOL), RewardPlayer(O_SYMBOL)]
+    minimax = MinimaxAlgorithm(Game(num_rows, num_cols, num_connects_to_win, players))
+    logger.info("building best action policies according to minimax algorithm")
+    policy = {state: move for state, (_, move) in minimax.get_best_policy().iteritems()}
+    logger.info("Finished building best action policies according to minimax algorithm")
+    return policy
+
+
+def get_policy(num_rows, num_cols, num_connects_to_win, shared=True):
+    """Returns the minimax policy of a board configuration
+
+    Every policy is built at most once per process and handed to every player asking for it. When shared, it is
+    also published in SHARED_DIRECTORY, where the other processes of the host map it instead of building it again.
+    """
+    key = (num_rows, num_cols, num_connects_to_win)
+    with _policies_lock:
+        if key not in _policies:
+            _policies[key] = _get_shared_policy(*key) if shared else build_policy(*key)
+        return _policies[key]
+
+
+def clear_policies():
+    with _policies_lock:
+        _policies.clear()
+
+
+def _get_shared_policy(num_rows, num_cols, num_connects_to_win):
+    filename = os.path.join(SHARED_DIRECTORY, "tictactoe_policy_v{}_{}x{}_{}.bin".format(
+        FILE_VERSION, num_rows, num_cols, num_connects_to_win))
+    if not os.path.exists(filename):
+        # one process builds the policy while the others wait for it. The lock is released by the system when the
+        # process holding it dies, so a killed build never blocks the next one; the lock file itself is left behind
+        with open(filename + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(filename):
+                    SharedPolicy.write(build_policy(num_rows, num_cols, num_connects_to_win), filename)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return SharedPolicy(filename)
@@ -0,0 +1,183 @@
+import heapq
+
+from sys import maxint
+
+from src.algorithm.tablebase import Outcome
+
+INFINITY = maxint
+
+
+class ProofResult:
+    def __init__(self, outcome, moves, winning_line, num_nodes):
+        # the outcome for the player to move in the solved position
+        self.outcome = outcome
+        # the moves of the proof from the solved position, the loser playing the reply that was hardest to refute
+        self.moves = moves
+        # the positions of the line the winner completes at the end of those moves
+        self.winning_line = winning_line
+        self.num_nodes = num_nodes
+
+    def __str__(self):
+        if self.outcome == Outcome.Draw:
+            return "{} (searched {} nodes)".format(self.outcome, self.num_nodes)
+        return "{} by playing {}, completing the line {} (searched {} nodes)".format(
+            self.outcome, self.moves, self.winning_line, self.num_nodes)
+
+
+class ProofNumberSolver:
+    """Proves the value of a position of an algorithm.minimax.Game with depth-first proof-number search (df-pn)
+
+    A search tries to prove that one player (the attacker) wins; a draw or a win of the other player disproves it.
+    The proof and disproof numbers of a node are the least number of leaves that still need to be proved or
+    disproved, and the search always expands the most proving node under them, so it spends its effort on the
+    lines where the result is decided quickest. The proof and disproof numbers are kept in a table keyed by game
+    state; when the table outgrows its size, the entries that took the least work to compute are dropped.
+    """
+    EVICTION_FRACTION = 0.25
+
+    def __init__(self, game, max_table_size=1000000):
+        self.game = game
+        self.max_table_size = max_table_size
+        self.table = {}
+        self.attacker = None
+        self.num_nodes = 0
+
+    def solve(self):
+        """Proves the outcome of the current position of the game for the player to move"""
+        self.num_nodes = 0
+        player_to_move = self.game.current_player.get_winning_reward()
+        opponent = self.game.players[0].get_winning_reward()
+        if self.prove(player_to_move):
+            outcome = Outcome.Win
+        elif self.prove(opponent):
+            outcome = Outcome.Loss
+        else:
+            return ProofResult(Outcome.Draw, None, None, self.num_nodes)
+        moves, winning_line = self._get_principal_variation()
+        return ProofResult(outcome, moves, winning_line, self.num_nodes)
+
+    def prove(self, attacker):
+        """Returns True if the given player (by winning reward) is proved to win, False if it is disproved"""
+        self.attacker = attacker
+        self.table = {}
+        proof_number, _ = self._search(INFINITY, INFINITY)
+        return proof_number == 0
+
+    def _get_terminal_numbers(self):
+        if self.game.engine.winner == self.attacker:
+            return 0, INFINITY
+        return INFINITY, 0
+
+    def _get_child_numbers(self, move):
+        self.game.make_move(move)
+        if self.game.is_game_over():
+            numbers = self._get_terminal_numbers()
+        else:
+            entry = self.table.get(tuple(self.game.game_state))
+            numbers = (entry[0], entry[1]) if entry is not None else (1, 1)
+        self.game.unmake_move(move)
+        return numbers
+
+    def _search(self, proof_threshold, disproof_threshold):
+        """Searches the current position until its proof or disproof number reaches its threshold"""
+        if self.game.is_game_over():
+            return self._get_terminal_numbers()
+        self.num_nodes += 1
+        first_node = self.num_nodes
+        is_or_node = self.game.current_player.get_winning_reward() == self.attacker
+        moves = sorted(self.game.get_available_moves())
+
+        while True:
+            children = [self._get_child_numbers(move) for move in moves]
+            # at an OR node the attacker needs one proved child, at an AND node all children need to be proved,
+            # the roles of the numbers swap between the two
+            if is_or_node:
+                ranks = [proof for proof, _ in children]
+                others = [disproof for _, disproof in children]
+                threshold, other_threshold = proof_threshold, disproof_threshold
+            else:
+                ranks = [disproof for _, disproof in children]
+                others = [proof for proof, _ in children]
+                threshold, other_threshold = disproof_threshold, proof_threshold
+            rank = min(ranks)
+            other = min(sum(others), INFINITY)
+            if rank >= threshold or other >= other_threshold:
+                break
+
+            best_idx = ranks.index(rank)
+            second_rank = min(ranks[:best_idx] + ranks[best_idx + 1:]) if len(ranks) > 1 else INFINITY
+            child_threshold = min(threshold, second_rank + 1)
+            if other_threshold == INFINITY:
+                child_other_threshold = INFINITY
+            else:
+                child_other_threshold = other_threshold - other + others[best_idx]
+            move = moves[best_idx]
+            self.game.make_move(move)
+            if is_or_node:
+                self._search(child_threshold, child_other_threshold)
+            else:
+                self._search(child_other_threshold, child_threshold)
+            self.game.unmake_move(move)
+
+        numbers = (rank, other) if is_or_node else (other, rank)
+        self._store(tuple(self.game.game_state), numbers, self.num_nodes - first_node + 1)
+        return numbers
+
+    def _store(self, state, numbers, work):
+        self.table[state] = (numbers[0], numbers[1], work)
+        if len(self.table) > self.max_table_size:
+            num_to_evict = int(self.max_table_size * ProofNumberSolver.EVICTION_FRACTION) + 1
+            for evicted_state in heapq.nsmallest(num_to_evict, self.table, key=lambda s: self.table[s][2]):
+                del self.table[evicted_state]
+
+    def _get_principal_variation(self):
+        """Follows the proof of the last search: the attacker plays a proved move, the defender the move that took
+        the most work to refute. Returns the moves and the winning line completed at the end."""
+        moves = []
+        while not self.game.is_game_over():
+            if self.game.current_player.get_winning_reward() == self.attacker:
+                best_move = self._get_proved_move()
+            else:
+                best_move = max(sorted(self.game.get_available_moves()), key=self._get_work)
+            self.game.make_move(best_move)
+            moves.append(best_move)
+        winning_line = self.game.engine.get_winning_line()
+        for move in reversed(moves):
+            self.game.unmake_move(move)
+        return moves, winning_line
+
+    def _get_work(self, move):
+        self.game.make_move(move)
+        entry = self.table.get(tuple(self.game.game_state))
+        self.game.unmake_move(move)
+        return entry[2] if entry is not None else 0
+
+    def _get_proved_move(self):
+        moves = sorted(self.game.get_available_moves())
+        proved_moves = [move for move in moves if self._get_child_numbers(move)[0] == 0]
+        if proved_moves:
+            return min(proved_moves, key=self._get_work)
+        # the proved move was evicted from the table, prove the moves again until one is proved
+        for move in moves:
+            self.game.make_move(move)
+            proof_number, _ = self._search(INFINITY, INFINITY)
+            self.game.unmake_move(move)
+            if proof_number == 0:
+                return move
+        raise RuntimeError("No proved move from a proved position")
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from src.algorithm.minimax import Game, RewardPlayer
+
+    if len(sys.argv) != 4:
+        sys.exit("usage: proof_number.py <num rows> <num cols> <num connects to win>")
+    num_rows, num_cols, num_connects_to_win = [int(arg) for arg in sys.argv[1:]]
+    g = Game(num_rows, num_cols, num_connects_to_win, [RewardPlayer(1), RewardPlayer(-1)])
+    start = time.time()
+    result = ProofNumberSolver(g).solve()
+    print("{}x{} connect {} for the first player: {}".format(num_rows, num_cols, num_connects_to_win, result))
+    print("Solved in {} seconds".format(time.time() - start))
@@ -0,0 +1,228 @@
+import struct
+
+from array import array
+from bisect import bisect_left
+from enum import Enum
+
+from src.model.engine import get_win_lines, NO_SYMBOL, X_SYMBOL, O_SYMBOL
+
+# unsigned 64 bit array type code, python 2 has no 'Q' but its 'L' is 64 bits wide on 64 bit unix
+KEY_TYPECODE = 'L' if array('L').itemsize == 8 else 'Q'
+
+
+class Outcome(Enum):
+    """The game theoretic result of a position, from the point of view of the player to move"""
+    Loss = 0
+    Draw = 1
+    Win = 2
+
+
+def encode_position(state):
+    """Encode a game state into a base 3 integer, each cell being a digit (empty 0, X 1, O 2)"""
+    key = 0
+    for cell in reversed(state):
+        key = key * 3 + cell % 3
+    return key
+
+
+def get_symbol_to_move(state):
+    num_x = sum(1 for cell in state if cell == X_SYMBOL)
+    num_o = sum(1 for cell in state if cell == O_SYMBOL)
+    return X_SYMBOL if num_x == num_o else O_SYMBOL
+
+
+class Tablebase:
+    """Win/draw/loss and distance to result (in plies) of every legal position of one board configuration"""
+    MAGIC = "TTTB"
+    HEADER_FORMAT = "<4sBBBQ"
+    DISTANCE_BITS = 6
+    IO_CHUNK_SIZE = 1 << 16
+
+    def __init__(self, num_rows, num_cols, num_connects_to_win, keys, entries):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_connects_to_win = num_connects_to_win
+        # sorted encoded positions, and the packed (outcome, distance) byte of each of them
+        self.keys = keys
+        self.entries = entries
+        self.powers = [3 ** i for i in range(num_rows * num_cols)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def check_board(self, num_rows, num_cols, num_connects_to_win):
+        """Raises a ValueError unless the tablebase was generated for the given board configuration"""
+        if (self.num_rows, self.num_cols, self.num_connects_to_win) != (num_rows, num_cols, num_connects_to_win):
+            raise ValueError("The tablebase is for {}x{} boards with {} to win, not {}x{} with {} to win".format(
+                self.num_rows, self.num_cols, self.num_connects_to_win, num_rows, num_cols, num_connects_to_win))
+
+    @staticmethod
+    def pack_entry(outcome, distance):
+        return outcome.value << Tablebase.DISTANCE_BITS | distance
+
+    @staticmethod
+    def unpack_entry(entry):
+        return Outcome(entry >> Tablebase.DISTANCE_BITS), entry & ((1 << Tablebase.DISTANCE_BITS) - 1)
+
+    def _find_entry(self, key):
+        idx = bisect_left(self.keys, key)
+        if idx == len(self.keys) or self.keys[idx] != key:
+            return None
+        return self.entries[idx]
+
+    def probe(self, state):
+        """Returns the (outcome, distance to result) of a position, or None if it is not a legal position"""
+        entry = self._find_entry(encode_position(state))
+        if entry is None:
+            return None
+        return Tablebase.unpack_entry(entry)
+
+    def get_best_move(self, state):
+        """Returns the position to play that keeps the best result in the fewest (or, when losing, most) plies"""
+        key = encode_position(state)
+        digit = get_symbol_to_move(state) % 3
+        best_move = None
+        best_rank = None
+        for position, cell in enumerate(state):
+            if cell != NO_SYMBOL:
+                continue
+            entry = self._find_entry(key + digit * self.powers[position])
+            if entry is None:
+                continue
+            child_outcome, child_distance = Tablebase.unpack_entry(entry)
+            # the child is scored from the opponent's point of view, so the lower the outcome the better
+            if child_outcome == Outcome.Win:
+                rank = (child_outcome.value, -child_distance)
+            else:
+                rank = (child_outcome.value, child_distance)
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
+                best_move = position
+        return best_move
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(struct.pack(Tablebase.HEADER_FORMAT, Tablebase.MAGIC, self.num_rows, self.num_cols,
+                                self.num_connects_to_win, len(self.keys)))
+            for start in range(0, len(self.keys), Tablebase.IO_CHUNK_SIZE):
+                chunk = self.keys[start:start + Tablebase.IO_CHUNK_SIZE]
+                f.write(struct.pack("<{}Q".format(len(chunk)), *chunk))
+            f.write(self.entries.tostring())
+
+    @staticmethod
+    def load(filename):
+        with open(filename, "rb") as f:
+            header = f.read(struct.calcsize(Tablebase.HEADER_FORMAT))
+            magic, num_rows, num_cols, num_connects_to_win, num_positions = \
+                struct.unpack(Tablebase.HEADER_FORMAT, header)
+            if magic != Tablebase.MAGIC:
+                raise ValueError("'{}' is not a tablebase file".format(filename))
+            keys = array(KEY_TYPECODE)
+            for start in range(0, num_positions, Tablebase.IO_CHUNK_SIZE):
+                chunk_size = min(Tablebase.IO_CHUNK_SIZE, num_positions - start)
+                keys.extend(struct.unpack("<{}Q".format(chunk_size), f.read(8 * chunk_size)))
+            entries = array('B')
+            entries.fromstring(f.read(num_positions))
+        return Tablebase(num_rows, num_cols, num_connects_to_win, keys, entries)
+
+
+class TablebaseGenerator:
+    """Builds a tablebase by retrograde analysis
+
+    Every move adds a stone, so the legal positions form layers by the number of stones played. All positions are
+    enumerated layer by layer first, then labeled backwards from the fullest layer: terminal positions get their
+    result directly, every other position takes its result from the already labeled positions one ply later. Each
+    position is visited exactly once and there is no recursion.
+    """
+
+    def __init__(self, num_rows, num_cols, num_connects_to_win):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_connects_to_win = num_connects_to_win
+        self.num_cells = num_rows * num_cols
+        self.powers = [3 ** i for i in range(self.num_cells)]
+        _, self.lines_through = get_win_lines(num_rows, num_cols, num_connects_to_win)
+
+    def _decode(self, key):
+        digits = [0] * self.num_cells
+        for position in range(self.num_cells):
+            key, digits[position] = divmod(key, 3)
+        return digits
+
+    def _is_winning_move(self, digits, position):
+        digit = digits[position]
+        for line in self.lines_through[position]:
+            if all(digits[other] == digit for other in line):
+                return True
+        return False
+
+    def _enumerate_layers(self, won):
+        """Returns the encoded positions by number of stones played, adding positions just won to `won`"""
+        layers = [[0]]
+        for num_played in range(self.num_cells):
+            digit = (X_SYMBOL if num_played % 2 == 0 else O_SYMBOL) % 3
+            next_layer = set()
+            for key in layers[-1]:
+                if key in won:
+                    continue
+                digits = self._decode(key)
+                for position in range(self.num_cells):
+                    if digits[position] != 0:
+                        continue
+                    child_key = key + digit * self.powers[position]
+                    if child_key in next_layer:
+                        continue
+                    next_layer.add(child_key)
+                    digits[position] = digit
+                    if self._is_winning_move(digits, position):
+                        won.add(child_key)
+                    digits[position] = 0
+            layers.append(list(next_layer))
+        return layers
+
+    def generate(self):
+        won = set()
+        layers = self._enumerate_layers(won)
+        labels = {}
+        for num_played in range(len(layers) - 1, -1, -1):
+            digit = (X_SYMBOL if num_played % 2 == 0 else O_SYMBOL) % 3
+            for key in layers[num_played]:
+                if key in won:
+                    # the previous player has just completed a line
+                    labels[key] = Tablebase.pack_entry(Outcome.Loss, 0)
+                    continue
+                digits = self._decode(key)
+                child_entries = [labels[key + digit * self.powers[position]]
+                                 for position in range(self.num_cells) if digits[position] == 0]
+                labels[key] = self._label_from_children(child_entries)
+
+        keys = sorted(labels)
+        return Tablebase(self.num_rows, self.num_cols, self.num_connects_to_win,
+                         array(KEY_TYPECODE, keys), array('B', (labels[key] for key in keys)))
+
+    def _label_from_children(self, child_entries):
+        if not child_entries:
+            # board is full without a winner
+            return Tablebase.pack_entry(Outcome.Draw, 0)
+        children = [Tablebase.unpack_entry(entry) for entry in child_entries]
+        losses = [distance for outcome, distance in children if outcome == Outcome.Loss]
+        if losses:
+            return Tablebase.pack_entry(Outcome.Win, min(losses) + 1)
+        draws = [distance for outcome, distance in children if outcome == Outcome.Draw]
+        if draws:
+            return Tablebase.pack_entry(Outcome.Draw, min(draws) + 1)
+        return Tablebase.pack_entry(Outcome.Loss, max(distance for _, distance in children) + 1)
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    if len(sys.argv) != 5:
+        sys.exit("usage: tablebase.py <num rows> <num cols> <num connects to win> <output file>")
+    start = time.time()
+    tablebase = TablebaseGenerator(*[int(arg) for arg in sys.argv[1:4]]).generate()
+    tablebase.save(sys.argv[4])
+    print("Solved {} positions in {} seconds, the empty board is a {} in {} plies"
+          .format(len(tablebase), time.time() - start, *[str(x) for x in tablebase.probe(
+              (NO_SYMBOL,) * (tablebase.num_rows * tablebase.num_cols))]))
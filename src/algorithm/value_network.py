@@ -0,0 +1,129 @@
+import numpy as np
+
+from src.model.engine import get_win_lines
+
+
+class LineFeatures:
+    """Describes positions by their lines, from the point of view of one player
+
+    For each number of stones from 1 to the number of connects to win, the features count the lines holding that
+    many stones of the player and none of the opponent's, then the same for the opponent. Their number only depends
+    on the number of connects to win, so it stays the same on any board size. The counts are log scaled to keep the
+    inputs of large boards in range.
+    """
+
+    def __init__(self, num_rows, num_cols, num_connects_to_win):
+        lines, _ = get_win_lines(num_rows, num_cols, num_connects_to_win)
+        self.lines = np.array(lines, dtype=np.intp).reshape(-1, num_connects_to_win)
+        self.num_connects_to_win = num_connects_to_win
+        self.num_features = 2 * num_connects_to_win
+
+    def extract(self, states, symbols):
+        """Returns the features of a batch of states, each from the point of view of the player with its symbol"""
+        relative_states = np.asarray(states, dtype=np.int8) * np.asarray(symbols, dtype=np.int8)[:, np.newaxis]
+        line_cells = relative_states[:, self.lines]
+        own = np.count_nonzero(line_cells == 1, axis=2)
+        other = np.count_nonzero(line_cells == -1, axis=2)
+        stone_counts = np.arange(1, self.num_connects_to_win + 1)
+        own_lines = (np.where(other == 0, own, 0)[:, :, np.newaxis] == stone_counts).sum(axis=1)
+        other_lines = (np.where(own == 0, other, 0)[:, :, np.newaxis] == stone_counts).sum(axis=1)
+        return np.log1p(np.hstack((own_lines, other_lines)).astype(np.float64))
+
+
+class ValueNetwork:
+    """A multilayer perceptron with one tanh hidden layer and a tanh output in [-1, 1], trained by minibatch
+    gradient descent on the squared error. Without a hidden layer it is a linear model squashed by the tanh."""
+
+    def __init__(self, num_inputs, hidden_size=32, seed=None):
+        random_state = np.random.RandomState(seed)
+        self.hidden_size = hidden_size
+        num_output_inputs = hidden_size if hidden_size else num_inputs
+        if hidden_size:
+            self.hidden_weights = random_state.normal(0.0, 1.0 / np.sqrt(num_inputs), (num_inputs, hidden_size))
+            self.hidden_biases = np.zeros(hidden_size)
+        self.output_weights = random_state.normal(0.0, 1.0 / np.sqrt(num_output_inputs), num_output_inputs)
+        self.output_bias = 0.0
+
+    def _forward(self, inputs):
+        hidden = np.tanh(inputs.dot(self.hidden_weights) + self.hidden_biases) if self.hidden_size else inputs
+        return hidden, np.tanh(hidden.dot(self.output_weights) + self.output_bias)
+
+    def predict(self, inputs):
+        return self._forward(inputs)[1]
+
+    def train_batch(self, inputs, targets, learning_rate):
+        """Takes one gradient step on a minibatch, returns its mean squared error before the step"""
+        hidden, outputs = self._forward(inputs)
+        errors = outputs - targets
+        output_deltas = errors * (1.0 - outputs ** 2) / len(inputs)
+        if self.hidden_size:
+            hidden_deltas = np.outer(output_deltas, self.output_weights) * (1.0 - hidden ** 2)
+            self.hidden_weights -= learning_rate * inputs.T.dot(hidden_deltas)
+            self.hidden_biases -= learning_rate * hidden_deltas.sum(axis=0)
+        self.output_weights -= learning_rate * hidden.T.dot(output_deltas)
+        self.output_bias -= learning_rate * output_deltas.sum()
+        return float(np.mean(errors ** 2))
+
+
+class ValueFunction:
+    """The value of the positions after a move for the player who made it, learned from the results of games
+
+    Every afterstate learned from goes into a bounded replay buffer of features and target values; each training
+    step fits the network to a random minibatch of it, so memory stays the same however many games are played.
+    """
+
+    def __init__(self, num_rows, num_cols, num_connects_to_win, hidden_size=32, learning_rate=0.01, batch_size=64,
+                 buffer_size=10000, seed=None):
+        self.num_cells = num_rows * num_cols
+        self.features = LineFeatures(num_rows, num_cols, num_connects_to_win)
+        self.network = ValueNetwork(self.features.num_features, hidden_size, seed)
+        self.learning_rate = learning_rate
+        self.batch_size = batch_size
+        self.random_state = np.random.RandomState(seed)
+
+        self._buffer_inputs = np.empty((buffer_size, self.features.num_features))
+        self._buffer_targets = np.empty(buffer_size)
+        self._buffer_next = 0
+        self._buffer_len = 0
+
+    def evaluate_moves(self, state, moves, symbol):
+        """Returns the value of each of the moves for the player with the symbol, all moves in one batch"""
+        afterstates = np.repeat(np.asarray(state, dtype=np.int8)[np.newaxis], len(moves), axis=0)
+        afterstates[np.arange(len(moves)), moves] = symbol
+        return self.network.predict(self.features.extract(afterstates, np.repeat(symbol, len(moves))))
+
+    def add_afterstates(self, afterstates, symbols, targets):
+        """Adds afterstates and their target values to the replay buffer, replacing the oldest ones when full"""
+        buffer_size = len(self._buffer_targets)
+        # only the newest ones fit when there are more than the buffer holds
+        inputs = self.features.extract(np.asarray(afterstates).reshape(-1, self.num_cells), symbols)[-buffer_size:]
+        targets = np.asarray(targets, dtype=np.float64)[-buffer_size:]
+        indices = (self._buffer_next + np.arange(len(inputs))) % buffer_size
+        self._buffer_inputs[indices] = inputs
+        self._buffer_targets[indices] = targets
+        self._buffer_next = (self._buffer_next + len(inputs)) % buffer_size
+        self._buffer_len = min(self._buffer_len + len(inputs), buffer_size)
+
+    def train(self, num_batches=1):
+        """Takes gradient steps on minibatches drawn from the replay buffer, returns the last minibatch error"""
+        loss = None
+        for _ in range(num_batches):
+            if self._buffer_len == 0:
+                break
+            indices = self.random_state.randint(0, self._buffer_len, min(self.batch_size, self._buffer_len))
+            loss = self.network.train_batch(self._buffer_inputs[indices], self._buffer_targets[indices],
+                                            self.learning_rate)
+        return loss
+
+    def __getstate__(self):
+        # the replay buffer is only needed while learning, it is not saved with the network
+        state = dict(self.__dict__)
+        state["_buffer_inputs"] = state["_buffer_inputs"].shape
+        state["_buffer_targets"] = state["_buffer_targets"].shape
+        state["_buffer_next"] = state["_buffer_len"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buffer_inputs = np.empty(self._buffer_inputs)
+        self._buffer_targets = np.empty(self._buffer_targets)
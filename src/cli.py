@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+import argparse
+import importlib
+import logging
+import sys
+import time
+
+from model.game import Game
+from model.player import PlayerType
+from src.algorithm.learning_agents import Agent
+
+logger = logging.getLogger(__name__)
+
+NUM_BOARD_ROWS = 3
+NUM_BOARD_COLS = 3
+NUM_CONNECTS_TO_WIN = 3
+
+# the players that can be seated, as (module, class), imported only when used. Nothing here imports pygame, the
+# visualizer is only imported when a UI is asked for
+PLAYER_CLASSES = {
+    "random": ("model.player", "RandomPlayer"),
+    "human": ("model.player", "HumanPlayer"),
+    "minimax": ("model.player", "MinimaxPlayer"),
+    "mc": ("model.player", "MCPlayer"),
+    "flat-mc": ("model.player", "FlatMCPlayer"),
+    "value-net": ("model.player", "ValueNetworkPlayer"),
+}
+# the players that learn, and can be trained
+LEARNING_PLAYERS = ["mc", "value-net"]
+
+
+def load_player_class(name):
+    if name not in PLAYER_CLASSES:
+        raise ValueError("Unknown player '{}', choose from {}".format(name, ", ".join(sorted(PLAYER_CLASSES))))
+    module_name, class_name = PLAYER_CLASSES[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_player(name, player_index, args, mode=None):
+    """Creates the named player for the given seat, warm started from the saved tables or tablebase if given, and
+    moving from a worker process if it has a time control"""
+    player_class = load_player_class(name)
+    player_type = PlayerType.MaxPlayer if player_index == 0 else PlayerType.MinPlayer
+    player_id = "{} Player {}".format(name, player_index + 1)
+    if name == "minimax":
+        player = player_class(player_id, player_type, to_start=player_index == 0, oracle=load_tablebase(args))
+    else:
+        player = player_class(player_id, player_type)
+    if hasattr(player, "load_experiences") and getattr(args, "load", None):
+        player.load_experiences(args.load)
+    if hasattr(player, "set_mode") and mode is not None:
+        player.set_mode(mode)
+        player.verbose = False
+    move_time, game_time = getattr(args, "move_time", None), getattr(args, "game_time", None)
+    if name != "human" and (move_time is not None or game_time is not None):
+        from model.time_control import TimeControl, TimedPlayer
+        player = TimedPlayer(player, TimeControl(move_time, game_time))
+    return player
+
+
+def load_tablebase(args):
+    if not getattr(args, "tablebase", None):
+        return None
+    from src.algorithm.tablebase import Tablebase
+    tablebase = Tablebase.load(args.tablebase)
+    tablebase.check_board(args.rows, args.cols, args.connects)
+    return tablebase
+
+
+def create_game(players, args):
+    g = Game(players, args.rows, args.cols, args.connects)
+    # no pauses between moves unless someone is watching
+    g.learning = not getattr(args, "ui", False)
+    for player in players:
+        player.set_game(g)
+    return g
+
+
+def train(args):
+    from src.algorithm.learning_agents import Mode
+
+    learner = create_player(args.player, 0, args, Mode.Learn)
+    if args.records:
+        from model.record import read_game_records
+        records = read_game_records(args.records)
+        if args.player == "mc":
+            from src.algorithm.offline_training import train_from_records
+            num_games = train_from_records(learner, records)
+        else:
+            num_games = learner.train_from_records(records)
+    else:
+        # the second seat learns from the other side of the same games, what it learns is not kept
+        opponent = create_player(args.player, 1, args, Mode.Learn)
+        g = create_game([learner, opponent], args)
+        for _ in range(args.games):
+            g.play()
+            g.reset()
+        num_games = args.games
+    learner.save_experiences(args.save)
+    print("Trained on {} games, saved to '{}'".format(num_games, args.save))
+
+
+def evaluate(args):
+    from src.algorithm.learning_agents import Mode
+
+    players = [create_player(args.player, 0, args, Mode.Play), create_player(args.opponent, 1, args, Mode.Play)]
+    g = create_game(players, args)
+    if args.ui:
+        import threading
+        # imported here so that pygame is only loaded when a UI is asked for
+        from view.visualizer import Visualizer
+        t = threading.Thread(target=_play_games, args=(g, args.games))
+        t.daemon = True
+        t.start()
+        Visualizer(g).run()
+        return
+    results = _play_games(g, args.games)
+    print("{}: {} wins, {} draws, {} losses".format(players[0].get_id(), results[0], results[2], results[1]))
+
+
+def _play_games(g, num_games):
+    """Returns the number of wins of each player, followed by the number of draws"""
+    results = [0, 0, 0]
+    for _ in range(num_games):
+        g.play()
+        winner = g.get_winner()
+        results[2 if winner is None else g.players.index(winner)] += 1
+        g.reset()
+    return results
+
+
+def solve(args):
+    start = time.time()
+    if args.method == "tablebase":
+        from src.algorithm.tablebase import TablebaseGenerator
+        tablebase = TablebaseGenerator(args.rows, args.cols, args.connects).generate()
+        if args.output:
+            tablebase.save(args.output)
+        print("Solved {} positions".format(len(tablebase)))
+    else:
+        from src.algorithm.minimax import Game as SearchGame, RewardPlayer
+        from src.algorithm.proof_number import ProofNumberSolver
+        g = SearchGame(args.rows, args.cols, args.connects, [RewardPlayer(1), RewardPlayer(-1)])
+        print(ProofNumberSolver(g).solve())
+    print("Solved in {} seconds".format(time.time() - start))
+
+
+def serve(args):
+    """Answers one board state per line on stdin (comma separated cell values, 0 empty, 1 X, -1 O) with the row
+    and column of the move to play on stdout, or with "error: " and the reason when there is no move to play. Stdout
+    only carries the answers, diagnostics go to the log on stderr."""
+    from src.algorithm.learning_agents import Mode
+
+    g = Game([None, None], args.rows, args.cols, args.connects)
+    players = [create_player(args.player, player_index, args, Mode.Play) for player_index in (0, 1)]
+    for player in players:
+        player.set_game(g)
+    for line in iter(sys.stdin.readline, ""):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            move = _answer_state(g, players, line)
+            answer = "{} {}".format(*move)
+        except Exception as e:
+            logger.warning("Cannot answer '%s': %s", line, e)
+            answer = "error: {}".format(e)
+        sys.stdout.write(answer + "\n")
+        sys.stdout.flush()
+
+
+def _answer_state(g, players, line):
+    state = tuple(int(cell) for cell in line.split(","))
+    if len(state) != g.game_board.num_rows * g.game_board.num_cols:
+        raise ValueError("expected {} cells, got {}".format(g.game_board.num_rows * g.game_board.num_cols, len(state)))
+    g.reset()
+    g.game_board.set_encoded_state(state)
+    if g.is_terminated():
+        raise ValueError("the game is over")
+    # X moves first, so X is to move whenever both have played the same number of moves
+    player = players[0] if state.count(1) == state.count(-1) else players[1]
+    move = player.get_next_move(state)
+    if isinstance(player, Agent):
+        # serving does not learn, forget the move instead of collecting an ever growing trajectory
+        player.forget_trajectory()
+    return move
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Tic-tac-toe agents without a UI")
+    parser.add_argument("--rows", type=int, default=NUM_BOARD_ROWS)
+    parser.add_argument("--cols", type=int, default=NUM_BOARD_COLS)
+    parser.add_argument("--connects", type=int, default=NUM_CONNECTS_TO_WIN)
+    commands = parser.add_subparsers()
+
+    train_parser = commands.add_parser("train", help="train a learning agent and save what it learned")
+    train_parser.add_argument("--player", choices=LEARNING_PLAYERS, default="mc")
+    train_parser.add_argument("--games", type=int, default=100000, help="number of self-play games")
+    train_parser.add_argument("--records", help="train offline on a game record file instead of self-play")
+    train_parser.add_argument("--load", help="warm start from what was saved by a previous training")
+    train_parser.add_argument("--save", required=True, help="file to save the learned tables to")
+    train_parser.set_defaults(command=train)
+
+    evaluate_parser = commands.add_parser("evaluate", help="play games between two players")
+    evaluate_parser.add_argument("player", choices=sorted(PLAYER_CLASSES))
+    evaluate_parser.add_argument("opponent", choices=sorted(PLAYER_CLASSES))
+    evaluate_parser.add_argument("--games", type=int, default=100)
+    evaluate_parser.add_argument("--load", help="saved tables or network of the learning players")
+    evaluate_parser.add_argument("--tablebase", help="tablebase of the minimax players, instead of searching")
+    evaluate_parser.add_argument("--ui", action="store_true", help="show the games")
+    evaluate_parser.add_argument("--move-time", type=float,
+                                 help="seconds a player gets per move, computing its moves in a worker process")
+    evaluate_parser.add_argument("--game-time", type=float, help="seconds a player gets for all its moves of a game")
+    evaluate_parser.set_defaults(command=evaluate)
+
+    solve_parser = commands.add_parser("solve", help="solve the board")
+    solve_parser.add_argument("--method", choices=["tablebase", "proof-number"], default="tablebase")
+    solve_parser.add_argument("--output", help="file to save the tablebase to")
+    solve_parser.set_defaults(command=solve)
+
+    serve_parser = commands.add_parser("serve", help="answer board states on stdin with moves on stdout")
+    serve_parser.add_argument("player", choices=sorted(set(PLAYER_CLASSES) - {"human"}))
+    serve_parser.add_argument("--load", help="saved tables or network of the learning player")
+    serve_parser.add_argument("--tablebase", help="tablebase of the minimax player, instead of searching")
+    serve_parser.add_argument("--move-time", type=float,
+                              help="seconds to answer a state, computing the moves in a worker process")
+    serve_parser.set_defaults(command=serve)
+    return parser
+
+
+def main(argv=None):
+    # progress and diagnostics go to stderr, stdout is left to the results (and to the answers of serve)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = build_parser().parse_args(argv)
+    args.command(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+NO_SYMBOL = 0
+X_SYMBOL = 1
+O_SYMBOL = -1
+
+# the line tables of every board shape, computed once per (num_rows, num_cols, num_connects_to_win)
+_line_tables_cache = {}
+
+
+def get_win_lines(num_rows, num_cols, num_connects_to_win):
+    """Returns the lines of positions that win the game when taken by one player, and the lines through each
+    position. Positions count through the cols row by row."""
+    lines, lines_through, _ = _get_line_tables(num_rows, num_cols, num_connects_to_win)
+    return lines, lines_through
+
+
+def get_line_ids_through(num_rows, num_cols, num_connects_to_win):
+    """Returns the indices (into the win lines) of the lines through each position"""
+    return _get_line_tables(num_rows, num_cols, num_connects_to_win)[2]
+
+
+def _get_line_tables(num_rows, num_cols, num_connects_to_win):
+    key = (num_rows, num_cols, num_connects_to_win)
+    if key not in _line_tables_cache:
+        lines = []
+        for row_idx in range(num_rows):
+            for col_idx in range(num_cols):
+                # only look downstream (right, down-right, down, down-left) so each line is found exactly once
+                for row_step, col_step in ((0, 1), (1, 1), (1, 0), (1, -1)):
+                    end_row = row_idx + row_step * (num_connects_to_win - 1)
+                    end_col = col_idx + col_step * (num_connects_to_win - 1)
+                    if 0 <= end_row < num_rows and 0 <= end_col < num_cols:
+                        lines.append(tuple((row_idx + i * row_step) * num_cols + col_idx + i * col_step
+                                           for i in range(num_connects_to_win)))
+        line_ids_through = tuple(tuple(line_id for line_id, line in enumerate(lines) if position in line)
+                                 for position in range(num_rows * num_cols))
+        lines_through = tuple(tuple(lines[line_id] for line_id in line_ids) for line_ids in line_ids_through)
+        _line_tables_cache[key] = (tuple(lines), lines_through, line_ids_through)
+    return _line_tables_cache[key]
+
+
+class Engine(object):
+    """The board state and rules shared by live games and searches
+
+    Moves are made and unmade in place. Every player keeps a count of its stones on each win line, updated for the
+    lines through the position played, so a win is detected the moment the move completing a line is made.
+    """
+
+    def __init__(self, num_rows, num_cols, num_connects_to_win):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_connects_to_win = num_connects_to_win
+        self.num_cells = num_rows * num_cols
+        self.lines, self.lines_through, self.line_ids_through = _get_line_tables(num_rows, num_cols,
+                                                                                 num_connects_to_win)
+
+        self.state = [NO_SYMBOL] * self.num_cells
+        self.available_moves = set(range(self.num_cells))
+        self.played_moves = []
+        self.winner = NO_SYMBOL
+        # the index of the line completed by the winner, and the number of moves played when it was completed
+        self.winning_line_id = None
+        self._num_moves_to_win = None
+        # the number of stones of each symbol on every line
+        self.line_counts = {X_SYMBOL: [0] * len(self.lines), O_SYMBOL: [0] * len(self.lines)}
+
+    def __str__(self):
+        state_str = (('----' * self.num_cols + '\n').join(['|{:^3d}|' * self.num_cols + '\n'] * self.num_rows)
+                     .format(*self.state))
+        return "game state: \n{}\n".format(state_str)
+
+    def clone(self):
+        """Returns an independent copy of the board, sharing only the immutable line tables"""
+        engine = Engine.__new__(Engine)
+        engine.__dict__.update(self.__dict__)
+        engine.state = list(self.state)
+        engine.available_moves = set(self.available_moves)
+        engine.played_moves = list(self.played_moves)
+        engine.line_counts = {symbol: list(counts) for symbol, counts in self.line_counts.iteritems()}
+        return engine
+
+    def get_encoded_state(self):
+        return tuple(self.state)
+
+    def get_winning_line(self):
+        """Returns the positions of the line completed by the winner, or None if nobody has won"""
+        if self.winning_line_id is None:
+            return None
+        return self.lines[self.winning_line_id]
+
+    def is_winning_move(self, position):
+        counts = self.line_counts[self.state[position]]
+        for line_id in self.line_ids_through[position]:
+            if counts[line_id] == self.num_connects_to_win:
+                return True
+        return False
+
+    def make_move(self, position, symbol):
+        if self.state[position] != NO_SYMBOL:
+            raise ValueError("Position {} on the game board is already occupied".format(position))
+        self.state[position] = symbol
+        self.available_moves.remove(position)
+        self.played_moves.append(position)
+        counts = self.line_counts[symbol]
+        for line_id in self.line_ids_through[position]:
+            counts[line_id] += 1
+            if counts[line_id] == self.num_connects_to_win and self.winner == NO_SYMBOL:
+                self.winner = symbol
+                self.winning_line_id = line_id
+                self._num_moves_to_win = len(self.played_moves)
+
+    def unmake_move(self, position=None):
+        """Takes back the last move, the position is only used to check it really was the last move"""
+        if not self.played_moves:
+            raise ValueError("No move to unmake")
+        if position is not None and position != self.played_moves[-1]:
+            raise ValueError("Can only unmake the last move played at {}, not {}".format(self.played_moves[-1],
+                                                                                      position))
+        position = self.played_moves.pop()
+        counts = self.line_counts[self.state[position]]
+        for line_id in self.line_ids_through[position]:
+            counts[line_id] -= 1
+        self.state[position] = NO_SYMBOL
+        self.available_moves.add(position)
+        if self._num_moves_to_win is not None and len(self.played_moves) < self._num_moves_to_win:
+            self.winner = NO_SYMBOL
+            self.winning_line_id = None
+            self._num_moves_to_win = None
+
+    def is_game_over(self):
+        return self.winner != NO_SYMBOL or not self.available_moves
+
+    def reset(self):
+        # reset in place, others may hold references to the state, moves and available moves
+        self.state[:] = [NO_SYMBOL] * self.num_cells
+        self.available_moves.clear()
+        self.available_moves.update(range(self.num_cells))
+        del self.played_moves[:]
+        self.winner = NO_SYMBOL
+        self.winning_line_id = None
+        self._num_moves_to_win = None
+        for counts in self.line_counts.itervalues():
+            counts[:] = [0] * len(self.lines)
@@ -2,11 +2,9 @@
 
 import time
 
-from enum import Enum
-
-NO_SYMBOL = 0
-X_SYMBOL = 1
-O_SYMBOL = -1
+from engine import Engine, NO_SYMBOL, X_SYMBOL, O_SYMBOL
+from profiling import Phase
+from record import GameRecord, check_recordable
 
 
 class GameError(Exception):
@@ -18,22 +16,10 @@ class GameError(Exception):
 
 
 class BoardCell:
-    class Direction(Enum):
-        Right = (0, 1)
-        DownRight = (1, 1)
-        Down = (1, 0)
-        DownLeft = (1, -1)
-
     def __init__(self, row_id, col_id, state=NO_SYMBOL):
         self.row_id = row_id
         self.col_id = col_id
         self.state = state
-        self.downstream_neighbors = {
-            BoardCell.Direction.Right: None,
-            BoardCell.Direction.DownRight: None,
-            BoardCell.Direction.Down: None,
-            BoardCell.Direction.DownLeft: None
-        }
 
     def __str__(self):
         return str("({}, {}): {}".format(self.row_id, self.col_id, self.state))
@@ -44,45 +30,15 @@ class BoardCell:
     def get_location(self):
         return self.row_id, self.col_id
 
-    def add_downstream_neighbor(self, direction, cell=None):
-        self.downstream_neighbors[direction] = cell
-
-    def is_neighbor_matching(self, direction):
-        neighbor = self.downstream_neighbors[direction]
-        if neighbor is not None and neighbor.state == self.state:
-            return True
-        return False
-
-    def get_all_matching_downstream_cells(self, direction):
-        neighbor = self.downstream_neighbors[direction]
-        if not self.is_neighbor_matching(direction):
-            return []
-        return [neighbor] + neighbor.get_all_matching_downstream_cells(direction)
-
-    def get_max_of_downstream_neighbors(self):
-        max_num_neighbors = 0
-        for direction in BoardCell.Direction:
-            neighbors = self.get_all_matching_downstream_cells(direction)
-            if len(neighbors) > max_num_neighbors:
-                max_num_neighbors = len(neighbors)
-        return max_num_neighbors
-
 
 class GameBoard:
     def __init__(self, num_rows, num_cols, num_connects_to_win):
         self.num_rows = num_rows
         self.num_cols = num_cols
         self.num_connects_to_win = num_connects_to_win
-        self.available_positions = set()
+        # the engine holds the actual board state and decides the winner, the cells mirror it for the views
+        self.engine = Engine(num_rows, num_cols, num_connects_to_win)
         self.cells = {(i, j): BoardCell(i, j) for i in range(num_rows) for j in range(num_cols)}
-        # build the cell tree, just need to build it once, since all neighbors are stored by reference, changes in the
-        # neighbor contents will be reflected when accessed
-        for location, cell in self.cells.iteritems():
-            self.available_positions.add(self.convert_cell_location_to_position(location))
-            for direction in BoardCell.Direction:
-                new_location = tuple(map(sum, zip(cell.get_location(), direction.value)))
-                if new_location in self.cells:
-                    cell.add_downstream_neighbor(direction, self.get_cell(new_location))
         self.positions = set(self.cells.keys())
 
     def get_cell(self, location):
@@ -105,31 +61,39 @@ class GameBoard:
             encoded_state[self.convert_cell_location_to_position(location)] = state
         return tuple(encoded_state)
 
+    def get_encoded_state(self):
+        """Same as encoding the board state, without going through the cells"""
+        return self.engine.get_encoded_state()
+
+    def set_encoded_state(self, state):
+        """Sets up the board in the given encoded state, as if its moves had been played"""
+        self.reset()
+        for position, cell_state in enumerate(state):
+            if cell_state != NO_SYMBOL:
+                self.set_cell_state(self.convert_position_to_cell_location(position), cell_state)
+
     def get_board_state(self):
         return ((location, cell.state) for location, cell in self.cells.iteritems())
 
     def get_winning_state(self):
-        for cell in self.cells.values():
-            if cell.state == NO_SYMBOL:
-                continue
-            if cell.get_max_of_downstream_neighbors() + 1 >= self.num_connects_to_win:
-                return cell.state
-        return NO_SYMBOL
+        return self.engine.winner
 
     def set_cell_state(self, location, state):
+        """Marks a cell, or clears it when it holds the last move made"""
         if location not in self.cells:
             raise ValueError("No cell at position ({}, {}) on the game board".format(*location))
-        self.cells[location].state = state
         if state != NO_SYMBOL:
-            self.available_positions.remove(self.convert_cell_location_to_position(location))
+            self.engine.make_move(self.convert_cell_location_to_position(location), state)
+        else:
+            self.engine.unmake_move(self.convert_cell_location_to_position(location))
+        self.cells[location].state = state
 
     def get_available_game_positions(self):
-        return self.available_positions
+        return self.engine.available_moves
 
     def reset(self):
-        self.available_positions = set()
-        for location, cell in self.cells.iteritems():
-            self.available_positions.add(self.convert_cell_location_to_position(location))
+        self.engine.reset()
+        for cell in self.cells.itervalues():
             cell.reset()
 
 
@@ -146,26 +110,62 @@ class Game:
         self.players = players
 
         self.learning = False
+        # hooks called around each phase of the play loop, see model.profiling
+        self.hooks = []
+        # positions played so far, and where to write the record of every finished game (see model.record)
+        self.move_history = []
+        self.recorder = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def set_recorder(self, recorder):
+        if recorder is not None:
+            # fail now rather than when the first game finishes
+            check_recordable(self.game_board.num_rows, self.game_board.num_cols,
+                             [player.get_id() for player in self.players])
+        self.recorder = recorder
+
+    def _run_phase(self, phase, player, func, *args):
+        """Runs one phase of the play loop, only paying for the timing when there are hooks to report to"""
+        if not self.hooks:
+            return func(*args)
+        for hook in self.hooks:
+            hook.on_phase_start(phase, player)
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.time() - start
+            for hook in self.hooks:
+                hook.on_phase_end(phase, player, elapsed)
 
     def play(self):
         """The main play loop of the model"""
-        while not self.is_terminated():
+        while not self._run_phase(Phase.IsTerminated, self.players[self.next_player_index], self.is_terminated):
             try:
                 next_player = self.get_next_player()
                 if hasattr(next_player, "evaluate_game_state"):
-                    next_player.evaluate_game_state(next_player.game)
-                move = next_player.get_next_move(self.game_board.encode_cell_state(self.get_game_board_state()))
+                    self._run_phase(Phase.EvaluateGameState, next_player, next_player.evaluate_game_state,
+                                    next_player.game)
+                state = self.game_board.get_encoded_state()
+                move = self._run_phase(Phase.GetNextMove, next_player, next_player.get_next_move, state)
                 if move is None:
                     # if no move available just skip
                     time.sleep(0 if self.learning else 0.1)
                     continue
-                self.make_move(self.next_player_index, move)
+                self._run_phase(Phase.MakeMove, next_player, self.make_move, self.next_player_index, move)
 
                 if self.learning is False:
                     time.sleep(0.1)
             except GameError as e:
                 print(e.msg)
         self.evaluate_game_board_final_state()
+        if self.recorder is not None:
+            self.recorder.write(self.get_game_record())
 
     def get_game_board_state(self):
         return self.game_board.get_board_state()
@@ -196,6 +196,11 @@ class Game:
         # it is a draw then
         return True
 
+    def get_game_record(self):
+        return GameRecord(self.game_board.num_rows, self.game_board.num_cols, self.game_board.num_connects_to_win,
+                          [player.get_id() for player in self.players], list(self.move_history),
+                          self.game_board.get_winning_state())
+
     def evaluate_game_board_final_state(self):
         """After making a move, allow all players to take a moment to evaluate the game board"""
         for player in self.players:
@@ -206,6 +211,7 @@ class Game:
         """Resets the state of the model"""
         # Reset the next player count
         self.next_player_index = 0
+        self.move_history = []
 
         # Reset the model board
         self.game_board.reset()
@@ -225,6 +231,7 @@ class Game:
 
         # actually make the move by changing the state of the target cell
         self.game_board.set_cell_state(location, symbol)
+        self.move_history.append(self.game_board.convert_cell_location_to_position(location))
 
         # switch to the next player
         self.next_player_index = (self.next_player_index + 1) % len(self.players)
@@ -7,8 +7,11 @@ from abc import ABCMeta, abstractmethod
 from enum import Enum
 from sys import maxint
 
-import src.algorithm.minimax as minimax_lib
 import src.algorithm.learning_agents as rl_lib
+import src.algorithm.policy_cache as policy_cache
+
+from src.algorithm.experience_table import EvictionPolicy
+from src.algorithm.minimax import MinimaxAlgorithm, Game as SearchGame, RewardPlayer
 
 
 class PlayerType(Enum):
@@ -40,8 +43,16 @@ class Player:
 
     def set_game(self, game):
         """Tell the player what game we are playing"""
+        self._check_oracle(getattr(self, "oracle", None), game)
         self.game = game
 
+    @staticmethod
+    def _check_oracle(oracle, game):
+        """An oracle (see algorithm.tablebase) only knows the positions of the board it was generated for"""
+        if oracle is not None and game is not None:
+            board = game.game_board
+            oracle.check_board(board.num_rows, board.num_cols, board.num_connects_to_win)
+
 
 class RandomPlayer(Player):
     def __init__(self, player_id, player_type):
@@ -69,7 +80,7 @@ class HumanPlayer(Player):
 
 
 class MinimaxPlayer(Player):
-    def __init__(self, player_id, player_type, to_start):
+    def __init__(self, player_id, player_type, to_start, oracle=None):
         if player_type != PlayerType.MaxPlayer and player_type != PlayerType.MinPlayer:
             raise RuntimeError("Player type '{}' not supported, only allow min or max player type for minmax player."
                                .format(player_type))
@@ -78,58 +89,114 @@ class MinimaxPlayer(Player):
         # should be an instance of GameBoard
         self.to_start = to_start
         self.policy = {}
-        if self.game is not None:
+        # a solved tablebase (see algorithm.tablebase) replaces building the policy by searching when it is given
+        self.oracle = oracle
+        if self.game is not None and self.oracle is None:
             self._build_minimax_action_policy()
 
     def set_game(self, game_board):
         super(MinimaxPlayer, self).set_game(game_board)
-        self._build_minimax_action_policy()
+        if self.oracle is None:
+            self._build_minimax_action_policy()
+
+    def set_oracle(self, oracle):
+        self._check_oracle(oracle, self.game)
+        self.oracle = oracle
 
     def get_next_move(self, state):
+        if self.oracle is not None:
+            move = self.oracle.get_best_move(state)
+            if move is None:
+                raise RuntimeError("No action policy for current game state.")
+            return self.game.game_board.convert_position_to_cell_location(move)
         if not self.policy:
             self._build_minimax_action_policy()
-        if state not in self.policy:
+        move = self.policy.get(state)
+        if move is None:
+            move = self._search_live_position(state)
+        return self.game.game_board.convert_position_to_cell_location(move)
+
+    def _search_live_position(self, state):
+        """Searches the positions the shared policy does not hold (e.g. set up with O to move first) from a clone
+        of the live board, so the live game is left untouched"""
+        engine = self.game.game_board.engine.clone()
+        players = [RewardPlayer(self.get_winning_reward()), RewardPlayer(-self.get_winning_reward())]
+        policy = MinimaxAlgorithm(SearchGame(engine.num_rows, engine.num_cols, engine.num_connects_to_win, players,
+                                             engine)).get_best_policy()
+        if state not in policy:
             raise RuntimeError("No action policy for current game state.")
-        return self.game.game_board.convert_position_to_cell_location(self.policy[state])
+        return policy[state][1]
 
     def _build_minimax_action_policy(self):
-        clone_player = copy.deepcopy(self)
-        if self.type == PlayerType.MinPlayer:
-            clone_player.type = PlayerType.MaxPlayer
-        elif self.type == PlayerType.MaxPlayer:
-            clone_player.type = PlayerType.MinPlayer
-
-        if self.to_start:
-            players = [self, clone_player]
-        else:
-            players = [clone_player, self]
-
-        g = minimax_lib.Game(self.game.game_board.num_rows, self.game.game_board.num_cols,
-                             self.game.game_board.num_connects_to_win, players)
-        minimax = minimax_lib.MinimaxAlgorithm(g)
-        print("building best action policies according to minimax algorithm")
-        best_policy = minimax.get_best_policy()
-        for state, policy in best_policy.iteritems():
-            _, move = policy
-            self.policy[state] = move
-        print("Finished building best action policies according to minimax algorithm")
+        # the policy of the board is solved once from the empty board and shared by every minimax player of the
+        # host, it holds the best moves of both players whichever move it is
+        engine = self.game.game_board.engine
+        self.policy = policy_cache.get_policy(engine.num_rows, engine.num_cols, engine.num_connects_to_win)
 
 
 class MCPlayer(Player, rl_lib.MonteCarloAgent):
 
-    def __init__(self, player_id, player_type):
+    def __init__(self, player_id, player_type, capacity=None, eviction_policy=EvictionPolicy.LeastVisited,
+                 publish_interval=100):
         Player.__init__(self, player_id, player_type)
-        rl_lib.MonteCarloAgent.__init__(self)
+        rl_lib.MonteCarloAgent.__init__(self, capacity, eviction_policy, publish_interval)
+
+    def set_oracle(self, oracle):
+        self._check_oracle(oracle, self.game)
+        rl_lib.MonteCarloAgent.set_oracle(self, oracle)
 
     def get_next_move(self, state):
         if self.game is None:
             raise RuntimeError("No game is set to the player. The player needs to have a reference to the game.")
 
         best_move = self.get_estimated_best_move(state, self.game.game_board.get_available_game_positions())
-        state_action_pair = (state, best_move)
-        self.trajectory.append(state_action_pair)
-        if state_action_pair not in self.visitation_counts:
-            self.visitation_counts[state_action_pair] = 0
-        self.visitation_counts[state_action_pair] += 1
+        self.add_to_trajectory((state, best_move))
 
         return self.game.game_board.convert_position_to_cell_location(best_move)
+
+
+class ValueNetworkPlayer(Player, rl_lib.ValueNetworkAgent):
+
+    def __init__(self, player_id, player_type, hidden_size=32, learning_rate=0.01, seed=None):
+        Player.__init__(self, player_id, player_type)
+        rl_lib.ValueNetworkAgent.__init__(self, hidden_size, learning_rate, seed=seed)
+
+    def set_oracle(self, oracle):
+        self._check_oracle(oracle, self.game)
+        rl_lib.ValueNetworkAgent.set_oracle(self, oracle)
+
+    def set_game(self, game):
+        super(ValueNetworkPlayer, self).set_game(game)
+        self.set_board(game.game_board.num_rows, game.game_board.num_cols, game.game_board.num_connects_to_win)
+
+    def get_next_move(self, state):
+        if self.game is None:
+            raise RuntimeError("No game is set to the player. The player needs to have a reference to the game.")
+        best_move = self.get_estimated_best_move(state, self.game.game_board.get_available_game_positions())
+        return self.game.game_board.convert_position_to_cell_location(best_move)
+
+
+class FlatMCPlayer(Player):
+    """Plays the move with the best average result over a batch of random playouts (see algorithm.playout)"""
+
+    def __init__(self, player_id, player_type, num_playouts=1000, seed=None):
+        Player.__init__(self, player_id, player_type)
+        self.num_playouts = num_playouts
+        # without a seed, the playouts follow the seed of the random module, as the other players do
+        self.seed = seed if seed is not None else random.randint(0, 2 ** 31 - 1)
+        self.evaluator = None
+
+    def set_game(self, game):
+        super(FlatMCPlayer, self).set_game(game)
+        # imported here so that numpy is only needed by the players that use it
+        from src.algorithm.playout import FlatMonteCarloEvaluator
+        self.evaluator = FlatMonteCarloEvaluator(game.game_board.num_rows, game.game_board.num_cols,
+                                                 game.game_board.num_connects_to_win, self.num_playouts, self.seed)
+
+    def get_next_move(self, state):
+        if self.evaluator is None:
+            raise RuntimeError("No game is set to the player. The player needs to have a reference to the game.")
+        move = self.evaluator.get_best_move(state)
+        if move is None:
+            raise RuntimeError("No moves available")
+        return self.game.game_board.convert_position_to_cell_location(move)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import bisect
+import marshal
+
+from enum import Enum
+
+
+class Phase(Enum):
+    IsTerminated = "is_terminated"
+    EvaluateGameState = "evaluate_game_state"
+    GetNextMove = "get_next_move"
+    MakeMove = "make_move"
+
+
+class GameHook:
+    """Base class of the hooks a game calls around each phase of its play loop, override what is needed"""
+
+    def __init__(self):
+        pass
+
+    def on_phase_start(self, phase, player):
+        pass
+
+    def on_phase_end(self, phase, player, elapsed):
+        pass
+
+
+class LatencyHistogram:
+    # bucket upper bounds in seconds, roughly logarithmic from 1 microsecond to 10 seconds
+    BUCKET_BOUNDS = [1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3,
+                     0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0]
+
+    def __init__(self):
+        self.counts = [0] * (len(LatencyHistogram.BUCKET_BOUNDS) + 1)
+        self.num_samples = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, elapsed):
+        self.counts[bisect.bisect_left(LatencyHistogram.BUCKET_BOUNDS, elapsed)] += 1
+        self.num_samples += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    def get_mean(self):
+        if self.num_samples == 0:
+            return 0.0
+        return self.total_time / self.num_samples
+
+    def get_percentile(self, percentile):
+        """Returns the upper bound of the bucket holding the given percentile (0 - 100) of the samples"""
+        if self.num_samples == 0:
+            return 0.0
+        target = self.num_samples * percentile / 100.0
+        seen = 0
+        for bucket_idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count > 0:
+                if bucket_idx < len(LatencyHistogram.BUCKET_BOUNDS):
+                    return LatencyHistogram.BUCKET_BOUNDS[bucket_idx]
+                return self.max_time
+        return self.max_time
+
+
+class LatencyProfiler(GameHook):
+    """Records latency histograms of every phase of the play loop, keyed by player class and phase"""
+
+    def __init__(self):
+        GameHook.__init__(self)
+        self.histograms = {}
+
+    def on_phase_end(self, phase, player, elapsed):
+        key = (player.__class__.__name__, phase)
+        if key not in self.histograms:
+            self.histograms[key] = LatencyHistogram()
+        self.histograms[key].add(elapsed)
+
+    def reset(self):
+        self.histograms = {}
+
+    def get_report(self):
+        lines = ["{:<20s} {:<20s} {:>10s} {:>12s} {:>12s} {:>12s} {:>12s}"
+                 .format("player", "phase", "calls", "total (s)", "mean (s)", "p99 (s)", "max (s)")]
+        for (player_class, phase), histogram in sorted(self.histograms.iteritems(),
+                                                       key=lambda item: -item[1].total_time):
+            lines.append("{:<20s} {:<20s} {:>10d} {:>12.6f} {:>12.6f} {:>12.6f} {:>12.6f}"
+                         .format(player_class, phase.value, histogram.num_samples, histogram.total_time,
+                                 histogram.get_mean(), histogram.get_percentile(99), histogram.max_time))
+        return "\n".join(lines)
+
+    def dump(self, filename):
+        """Write a human readable report, including the raw histogram buckets, to the given file"""
+        with open(filename, "w") as f:
+            f.write(self.get_report() + "\n\n")
+            f.write("bucket upper bounds (s): {}\n".format(LatencyHistogram.BUCKET_BOUNDS))
+            for (player_class, phase), histogram in sorted(self.histograms.iteritems(),
+                                                           key=lambda item: (item[0][0], item[0][1].value)):
+                f.write("{} {}: {}\n".format(player_class, phase.value, histogram.counts))
+
+    def dump_stats(self, filename):
+        """Write the measurements in the marshalled format that `pstats.Stats` loads, one entry per (player, phase)"""
+        stats = {}
+        for (player_class, phase), histogram in self.histograms.iteritems():
+            # pstats keys are (file name, line number, function name), the values are (primitive calls, total calls,
+            # total time, cumulative time, callers)
+            function = (player_class, 0, phase.value)
+            stats[function] = (histogram.num_samples, histogram.num_samples, histogram.total_time,
+                               histogram.total_time, {})
+        with open(filename, "wb") as f:
+            marshal.dump(stats, f)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+import os
+import struct
+
+# a game record file starts with the magic and the format version, followed by records laid out as
+#   rows (B), cols (B), connects to win (B), result (b), number of moves (H),
+#   the id of each of the two players as a length (B) prefixed utf-8 string,
+#   and one byte per move with the position played (row * cols + col)
+FILE_MAGIC = "TTTR"
+FILE_VERSION = 1
+FILE_HEADER_FORMAT = "<4sB"
+RECORD_HEADER_FORMAT = "<BBBbH"
+NUM_PLAYERS = 2
+MAX_NUM_CELLS = 256
+MAX_PLAYER_ID_LENGTH = 255
+
+
+def _encode_player_id(player_id):
+    return player_id.encode("utf-8") if isinstance(player_id, unicode) else str(player_id)
+
+
+def check_recordable(num_rows, num_cols, player_ids):
+    """Raises a ValueError if the games of a board between the players cannot be recorded"""
+    if num_rows * num_cols > MAX_NUM_CELLS:
+        raise ValueError("Boards of more than {} cells cannot be recorded".format(MAX_NUM_CELLS))
+    for player_id in player_ids:
+        if len(_encode_player_id(player_id)) > MAX_PLAYER_ID_LENGTH:
+            raise ValueError("Player id '{}' is longer than {} bytes, it cannot be recorded".format(
+                player_id, MAX_PLAYER_ID_LENGTH))
+
+
+class GameRecord:
+    def __init__(self, num_rows, num_cols, num_connects_to_win, player_ids, moves, result):
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_connects_to_win = num_connects_to_win
+        # utf-8 encoded when read back from a file
+        self.player_ids = player_ids
+        # the positions played, the first player (X) playing the even moves
+        self.moves = moves
+        # the symbol of the winner, or NO_SYMBOL for a draw
+        self.result = result
+
+    def __str__(self):
+        return "{} vs {} on {}x{} ({} to win): moves {}, result {}".format(
+            self.player_ids[0], self.player_ids[1], self.num_rows, self.num_cols, self.num_connects_to_win,
+            self.moves, self.result)
+
+    def encode(self):
+        check_recordable(self.num_rows, self.num_cols, self.player_ids)
+        parts = [struct.pack(RECORD_HEADER_FORMAT, self.num_rows, self.num_cols, self.num_connects_to_win,
+                             self.result, len(self.moves))]
+        for player_id in self.player_ids:
+            encoded_id = _encode_player_id(player_id)
+            parts.append(struct.pack("<B", len(encoded_id)) + encoded_id)
+        parts.append(struct.pack("<{}B".format(len(self.moves)), *self.moves))
+        return "".join(parts)
+
+
+class GameRecordWriter:
+    """Appends game records to a file, writing them out in bulk once enough records are buffered"""
+
+    def __init__(self, filename, buffer_size=1024):
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.num_written = 0
+        self._file = open(filename, "ab")
+        if os.path.getsize(filename) == 0:
+            self._file.write(struct.pack(FILE_HEADER_FORMAT, FILE_MAGIC, FILE_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record):
+        self.buffer.append(record.encode())
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self._file.write("".join(self.buffer))
+        self._file.flush()
+        self.num_written += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+def _read_exactly(f, num_bytes):
+    data = f.read(num_bytes)
+    if len(data) != num_bytes:
+        raise ValueError("Truncated game record in '{}'".format(f.name))
+    return data
+
+
+def read_game_records(filename):
+    """Yields the game records of a file one at a time, so any number of games can be replayed in constant memory"""
+    record_header_size = struct.calcsize(RECORD_HEADER_FORMAT)
+    with open(filename, "rb") as f:
+        magic, version = struct.unpack(FILE_HEADER_FORMAT, _read_exactly(f, struct.calcsize(FILE_HEADER_FORMAT)))
+        if magic != FILE_MAGIC:
+            raise ValueError("'{}' is not a game record file".format(filename))
+        if version != FILE_VERSION:
+            raise ValueError("Game record format version {} not supported".format(version))
+        while True:
+            header = f.read(record_header_size)
+            if not header:
+                return
+            if len(header) != record_header_size:
+                raise ValueError("Truncated game record in '{}'".format(filename))
+            num_rows, num_cols, num_connects_to_win, result, num_moves = struct.unpack(RECORD_HEADER_FORMAT, header)
+            player_ids = []
+            for _ in range(NUM_PLAYERS):
+                id_length = ord(_read_exactly(f, 1))
+                player_ids.append(_read_exactly(f, id_length))
+            moves = list(struct.unpack("<{}B".format(num_moves), _read_exactly(f, num_moves)))
+            yield GameRecord(num_rows, num_cols, num_connects_to_win, player_ids, moves, result)
+
+
+def replay_game_record(record):
+    """Yields the flat game state (as encoded by the game board) before each move, together with the move played"""
+    state = [0] * (record.num_rows * record.num_cols)
+    for move_idx, move in enumerate(record.moves):
+        yield tuple(state), move
+        # the first player plays X (1), the second plays O (-1)
+        state[move] = 1 if move_idx % 2 == 0 else -1
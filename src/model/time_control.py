@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+import logging
+import multiprocessing
+import time
+
+from game import Game
+from player import Player, RandomPlayer
+from src.algorithm.learning_agents import Agent
+
+logger = logging.getLogger(__name__)
+
+
+class TimeControl:
+    """The time a player gets to move, in seconds: a budget per move and a clock for the whole game, either of them
+    None for no limit"""
+
+    def __init__(self, move_time=None, total_time=None):
+        self.move_time = move_time
+        self.total_time = total_time
+
+    def get_move_budget(self, remaining_time):
+        budgets = [budget for budget in (self.move_time, remaining_time) if budget is not None]
+        return max(0.0, min(budgets)) if budgets else None
+
+
+def _compute_moves(player, num_rows, num_cols, num_connects_to_win, connection):
+    """The worker process loop, answering each (request id, state) with (request id, move) until it gets None"""
+    game = Game([None, None], num_rows, num_cols, num_connects_to_win)
+    player.set_game(game)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        request_id, state = request
+        game.reset()
+        game.game_board.set_encoded_state(state)
+        try:
+            move = player.get_next_move(state)
+        except Exception as e:
+            logger.warning("%s failed to move: %s", player, e)
+            move = None
+        if isinstance(player, Agent):
+            # the worker only plays, no game is ever finished here to learn from
+            player.forget_trajectory()
+        connection.send((request_id, move))
+
+
+class TimedPlayer(Player):
+    """Moves for another player, computing its moves in a worker process within a time control
+
+    The game thread only waits for the worker as long as the budget of the move allows. When the worker does not
+    answer in time, fails, or the clock of the game has run out, the fallback player (a random player by default)
+    moves instead and the late answer is dropped. The worker keeps its own copy of the player, so the player does
+    not learn from the games it plays this way.
+    """
+
+    def __init__(self, player, time_control, fallback=None):
+        Player.__init__(self, player.get_id(), player.type)
+        self.player = player
+        self.time_control = time_control
+        self.fallback = fallback if fallback is not None else RandomPlayer(player.get_id(), player.type)
+        self.remaining_time = time_control.total_time
+        self.num_timeouts = 0
+        self._worker = None
+        self._connection = None
+        self._next_request_id = 0
+
+    def set_game(self, game):
+        super(TimedPlayer, self).set_game(game)
+        self.fallback.set_game(game)
+        self.remaining_time = self.time_control.total_time
+        self.stop()
+        self._connection, worker_connection = multiprocessing.Pipe()
+        self._worker = multiprocessing.Process(target=_compute_moves, args=(
+            self.player, game.game_board.num_rows, game.game_board.num_cols, game.game_board.num_connects_to_win,
+            worker_connection))
+        self._worker.daemon = True
+        self._worker.start()
+
+    def get_next_move(self, state):
+        if self._worker is None:
+            raise RuntimeError("No game is set to the player. The player needs to have a reference to the game.")
+        start = time.time()
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        move = self._request_move(request_id, state, self.time_control.get_move_budget(self.remaining_time))
+        if move is None:
+            self.num_timeouts += 1
+            move = self.fallback.get_next_move(state)
+        if self.remaining_time is not None:
+            self.remaining_time -= time.time() - start
+        return move
+
+    def _request_move(self, request_id, state, budget):
+        """Returns the move of the worker, or None if it did not answer within the budget"""
+        if budget == 0:
+            # the clock has run out, the worker would compute a move nobody waits for
+            return None
+        deadline = None if budget is None else time.time() + budget
+        try:
+            self._connection.send((request_id, state))
+            while True:
+                timeout = None if deadline is None else deadline - time.time()
+                if timeout is not None and (timeout <= 0 or not self._connection.poll(timeout)):
+                    return None
+                answer_id, move = self._connection.recv()
+                if answer_id == request_id:
+                    return move
+                # a late answer to a move the fallback made
+        except (EOFError, IOError):
+            logger.warning("The worker of %s has stopped", self)
+            return None
+
+    def evaluate_game_board_final_state(self, game):
+        # the clock starts again with the next game
+        self.remaining_time = self.time_control.total_time
+
+    def stop(self):
+        """Stops the worker process, it is started again by the next set_game"""
+        if self._worker is None:
+            return
+        try:
+            self._connection.send(None)
+        except IOError:
+            pass
+        self._worker.join(1)
+        if self._worker.is_alive():
+            # still busy with a move, nothing it computes is needed any more
+            self._worker.terminate()
+        self._worker = None
+        self._connection = None
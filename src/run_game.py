@@ -1,10 +1,10 @@
 #!/usr/bin/env python
 
+import logging
 import threading
 import time
 
 from src.algorithm.learning_agents import Mode
-from view.visualizer import Visualizer
 from model.player import RandomPlayer, HumanPlayer, MinimaxPlayer, MCPlayer, PlayerType
 from model.game import Game
 
@@ -42,6 +42,7 @@ def start_game(players, max_num_games, is_learning):
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Initializing game with players...")
     minimax_player = MinimaxPlayer("MiniMax Player", PlayerType.MaxPlayer, to_start=True)
     human_player = HumanPlayer("Human Player", PlayerType.MaxPlayer)
@@ -55,6 +56,8 @@ def main():
     g = start_game(players=[human_player, mc_player2], max_num_games=100, is_learning=False)
 
     print("Setting up visualization daemon thread ...")
+    # imported here, pygame is only needed once there is something to show
+    from view.visualizer import Visualizer
     vis = Visualizer(g)
     vis.run()
 
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+
+import inspect
+import logging
+import math
+import multiprocessing
+import random
+
+from enum import Enum
+
+from model.player import RandomPlayer, MinimaxPlayer, MCPlayer, PlayerType
+from model.game import Game
+
+NUM_BOARD_ROWS = 3
+NUM_BOARD_COLS = 3
+NUM_CONNECTS_TO_WIN = 3
+
+
+class Format(Enum):
+    RoundRobin = "round-robin"
+    Swiss = "swiss"
+
+
+class PlayerSpec:
+    """Describes how to create a player, so every match (possibly in another process) can build fresh players
+
+    The optional setup is called with every new player before it plays, e.g. to load what it has learned (see
+    LoadExperiences and UseTablebase). As the spec is sent to the worker processes, the setup must be picklable: a
+    module level function or an instance of a module level class.
+    """
+
+    def __init__(self, name, player_class, setup=None, **kwargs):
+        self.name = name
+        self.player_class = player_class
+        self.setup = setup
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return self.name
+
+    def create(self, player_type, to_start):
+        kwargs = dict(self.kwargs)
+        if "to_start" in inspect.getargspec(self.player_class.__init__).args:
+            kwargs["to_start"] = to_start
+        player = self.player_class(self.name, player_type, **kwargs)
+        if self.setup is not None:
+            self.setup(player)
+        if hasattr(player, "set_mode"):
+            # imported here so the runner does not depend on the learning agents unless they are used
+            from src.algorithm.learning_agents import Mode
+            player.set_mode(Mode.Play)
+            player.verbose = False
+        return player
+
+
+class LoadExperiences:
+    """Player setup loading the tables or network a learning agent saved, so the agent plays what it has learned"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __call__(self, player):
+        player.load_experiences(self.filename)
+
+
+# the tablebases loaded by this process, by file name, shared by all the games it plays as they are read only
+_tablebases = {}
+
+
+class UseTablebase:
+    """Player setup giving the player a tablebase to consult for its moves"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __call__(self, player):
+        if self.filename not in _tablebases:
+            # imported here so the runner does not depend on the tablebase unless it is used
+            from src.algorithm.tablebase import Tablebase
+            _tablebases[self.filename] = Tablebase.load(self.filename)
+        player.set_oracle(_tablebases[self.filename])
+
+
+def play_match(match):
+    """Plays a single game between two player specs, returns 1 if the first (X) player wins, -1 if the second (O)
+    player wins and 0 for a draw. It is a module level function so that it can be sent to worker processes"""
+    seed, spec_x, spec_o, num_rows, num_cols, num_connects_to_win = match
+    random.seed(seed)
+    players = [spec_x.create(PlayerType.MaxPlayer, to_start=True),
+               spec_o.create(PlayerType.MinPlayer, to_start=False)]
+    g = Game(players, num_rows, num_cols, num_connects_to_win)
+    g.learning = True
+    for player in players:
+        player.set_game(g)
+    g.play()
+    winner = g.get_winner()
+    if winner is None:
+        return 0
+    return 1 if winner is players[0] else -1
+
+
+class Standing:
+    def __init__(self, name):
+        self.name = name
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.rating = Tournament.INITIAL_RATING
+        # the standard error of the rating
+        self.rating_deviation = 0.0
+
+    def get_num_games(self):
+        return self.wins + self.draws + self.losses
+
+    def get_score(self):
+        return self.wins + 0.5 * self.draws
+
+    def get_score_interval(self, z):
+        """Wilson score interval of the expected score per game"""
+        num_games = self.get_num_games()
+        if num_games == 0:
+            return 0.0, 1.0
+        p = self.get_score() / num_games
+        denominator = 1 + z * z / num_games
+        center = (p + z * z / (2 * num_games)) / denominator
+        half_width = z * math.sqrt(p * (1 - p) / num_games + z * z / (4 * num_games * num_games)) / denominator
+        return max(center - half_width, 0.0), min(center + half_width, 1.0)
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400.0))
+
+
+def invert_matrix(matrix):
+    """Inverts a small square matrix (a list of rows) by Gauss-Jordan elimination with partial pivoting"""
+    size = len(matrix)
+    rows = [list(row) + [1.0 if i == j else 0.0 for j in range(size)] for i, row in enumerate(matrix)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda i: abs(rows[i][col]))
+        if rows[pivot][col] == 0:
+            raise ValueError("Matrix is singular")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        pivot_value = rows[col][col]
+        rows[col] = [value / pivot_value for value in rows[col]]
+        for i in range(size):
+            if i != col and rows[i][col] != 0:
+                factor = rows[i][col]
+                rows[i] = [value - factor * pivot_row_value for value, pivot_row_value in zip(rows[i], rows[col])]
+    return [row[size:] for row in rows]
+
+
+class Tournament:
+    INITIAL_RATING = 1500
+    # z value of a 95% confidence interval
+    CONFIDENCE_Z = 1.96
+    RATING_ITERATIONS = 500
+    RATING_STEP = 200
+
+    def __init__(self, player_specs, num_rows=NUM_BOARD_ROWS, num_cols=NUM_BOARD_COLS,
+                 num_connects_to_win=NUM_CONNECTS_TO_WIN, seed=0, num_workers=None):
+        if len(player_specs) < 2:
+            raise ValueError("A tournament needs at least two players")
+        if len(set(spec.name for spec in player_specs)) != len(player_specs):
+            raise ValueError("Player names in a tournament must be unique")
+        self.player_specs = player_specs
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_connects_to_win = num_connects_to_win
+        self.seed = seed
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.results = []
+        self.standings = {spec.name: Standing(spec.name) for spec in player_specs}
+
+    def _play_pairings(self, pairings, pool):
+        """Plays the (X spec, O spec) pairings, each game seeded by its index in the whole tournament"""
+        matches = [(self.seed + len(self.results) + i, spec_x, spec_o,
+                    self.num_rows, self.num_cols, self.num_connects_to_win)
+                   for i, (spec_x, spec_o) in enumerate(pairings)]
+        outcomes = pool.map(play_match, matches) if pool is not None else [play_match(m) for m in matches]
+        for (spec_x, spec_o), outcome in zip(pairings, outcomes):
+            self._record_result(spec_x.name, spec_o.name, outcome)
+
+    def _record_result(self, name_x, name_o, outcome):
+        self.results.append((name_x, name_o, outcome))
+        standing_x = self.standings[name_x]
+        standing_o = self.standings[name_o]
+        if outcome > 0:
+            standing_x.wins += 1
+            standing_o.losses += 1
+        elif outcome < 0:
+            standing_x.losses += 1
+            standing_o.wins += 1
+        else:
+            standing_x.draws += 1
+            standing_o.draws += 1
+
+    def _get_round_robin_pairings(self, games_per_pairing):
+        """Every player meets every other player the given number of times with each of the symbols"""
+        return [(spec_x, spec_o)
+                for spec_x in self.player_specs for spec_o in self.player_specs if spec_x is not spec_o
+                for _ in range(games_per_pairing)]
+
+    def _get_swiss_pairings(self, played_pairs):
+        """Pairs up players with similar scores that have not met yet, the last player left out gets a bye"""
+        ranked = sorted(self.player_specs, key=lambda spec: (-self.standings[spec.name].get_score(), spec.name))
+        pairings = []
+        while len(ranked) > 1:
+            spec = ranked.pop(0)
+            opponent_idx = next((i for i, other in enumerate(ranked)
+                                 if frozenset((spec.name, other.name)) not in played_pairs), 0)
+            opponent = ranked.pop(opponent_idx)
+            played_pairs.add(frozenset((spec.name, opponent.name)))
+            # alternate who starts by letting the player who has had X less often start
+            if self._count_games_as_x(spec.name) <= self._count_games_as_x(opponent.name):
+                pairings.append((spec, opponent))
+            else:
+                pairings.append((opponent, spec))
+        return pairings
+
+    def _count_games_as_x(self, name):
+        return sum(1 for name_x, _, _ in self.results if name_x == name)
+
+    def run(self, tournament_format=Format.RoundRobin, games_per_pairing=10, num_rounds=None):
+        pool = multiprocessing.Pool(self.num_workers) if self.num_workers > 1 else None
+        try:
+            if tournament_format == Format.RoundRobin:
+                self._play_pairings(self._get_round_robin_pairings(games_per_pairing), pool)
+            elif tournament_format == Format.Swiss:
+                played_pairs = set()
+                for _ in range(num_rounds or len(self.player_specs) - 1):
+                    pairings = self._get_swiss_pairings(played_pairs)
+                    # every pairing plays a mini match of games_per_pairing games, swapping symbols every game
+                    self._play_pairings([pairing if i % 2 == 0 else pairing[::-1]
+                                         for pairing in pairings for i in range(games_per_pairing)], pool)
+            else:
+                raise ValueError("Tournament format '{}' not supported".format(tournament_format))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self._compute_ratings()
+        return self.standings
+
+    def _compute_ratings(self):
+        """Fits Elo ratings to all results at once (maximum likelihood), so they do not depend on the game order"""
+        names = [spec.name for spec in self.player_specs]
+        ratings = {name: float(Tournament.INITIAL_RATING) for name in names}
+        for _ in range(Tournament.RATING_ITERATIONS):
+            # every player also gets one virtual draw against an average player, otherwise a player winning or
+            # losing all of its games would have no finite rating
+            gradients = {name: 0.5 - expected_score(ratings[name], Tournament.INITIAL_RATING) for name in names}
+            for name_x, name_o, outcome in self.results:
+                surprise = (outcome + 1) / 2.0 - expected_score(ratings[name_x], ratings[name_o])
+                gradients[name_x] += surprise
+                gradients[name_o] -= surprise
+            for name in names:
+                ratings[name] += Tournament.RATING_STEP * gradients[name] / (self.standings[name].get_num_games() + 1)
+        deviations = self._compute_rating_deviations(names, ratings)
+        for name in names:
+            self.standings[name].rating = ratings[name]
+            self.standings[name].rating_deviation = deviations[name]
+
+    def _compute_rating_deviations(self, names, ratings):
+        """The standard errors of the fitted ratings, from the inverse of the Fisher information (the Hessian of the
+        log likelihood) at the fit: the flatter the likelihood around a rating, the wider its interval"""
+        # the derivative of the expected score by the rating difference is c * p * (1 - p)
+        c = math.log(10) / 400
+        index = {name: i for i, name in enumerate(names)}
+        information = [[0.0] * len(names) for _ in names]
+        for name in names:
+            # the virtual draw against a fixed average player, which also anchors the rating scale
+            p = expected_score(ratings[name], Tournament.INITIAL_RATING)
+            information[index[name]][index[name]] += c * c * p * (1 - p)
+        for name_x, name_o, _ in self.results:
+            p = expected_score(ratings[name_x], ratings[name_o])
+            weight = c * c * p * (1 - p)
+            i, j = index[name_x], index[name_o]
+            information[i][i] += weight
+            information[j][j] += weight
+            information[i][j] -= weight
+            information[j][i] -= weight
+        covariance = invert_matrix(information)
+        # ratings only mean something relative to each other, so the error is the one of the rating relative to the
+        # average rating of the field, without the uncertainty of the whole field shifting together
+        num_players = len(names)
+        row_means = [sum(row) / num_players for row in covariance]
+        total_mean = sum(row_means) / num_players
+        return {name: math.sqrt(max(covariance[index[name]][index[name]] - 2 * row_means[index[name]] + total_mean,
+                                    0.0))
+                for name in names}
+
+    def get_report(self):
+        lines = ["{:<20s} {:>6s} {:>6s} {:>6s} {:>6s} {:>8s} {:>17s} {:>8s} {:>17s}"
+                 .format("player", "games", "wins", "draws", "losses", "score", "score 95% CI", "elo", "elo 95% CI")]
+        for standing in sorted(self.standings.values(), key=lambda s: -s.rating):
+            num_games = standing.get_num_games()
+            score = standing.get_score() / num_games if num_games else 0.0
+            score_low, score_high = standing.get_score_interval(Tournament.CONFIDENCE_Z)
+            elo_low = standing.rating - Tournament.CONFIDENCE_Z * standing.rating_deviation
+            elo_high = standing.rating + Tournament.CONFIDENCE_Z * standing.rating_deviation
+            lines.append("{:<20s} {:>6d} {:>6d} {:>6d} {:>6d} {:>7.1f}% {:>7.1f}% - {:>5.1f}% {:>8.0f} {:>8.0f} - {:>6.0f}"
+                         .format(standing.name, num_games, standing.wins, standing.draws, standing.losses,
+                                 100 * score, 100 * score_low, 100 * score_high, standing.rating, elo_low, elo_high))
+        return "\n".join(lines)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    player_specs = [PlayerSpec("Random Player", RandomPlayer),
+                    PlayerSpec("MiniMax Player", MinimaxPlayer),
+                    PlayerSpec("MC Player", MCPlayer)]
+    tournament = Tournament(player_specs)
+    tournament.run(Format.RoundRobin, games_per_pairing=20)
+    print(tournament.get_report())
+
+
+if __name__ == '__main__':
+    main()